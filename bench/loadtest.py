@@ -0,0 +1,398 @@
+"""Load test main:app against local OpenAI and Telegram stand-ins.
+
+Starts the stubs from bench/stubs.py, runs the app under uvicorn in a
+subprocess pointed at them (OPENAI_BASE_URL / TELEGRAM_API_BASE), then
+drives each endpoint at increasing concurrency and reports throughput,
+p50/p95/p99 latency, event-loop lag, RSS growth and outbound call counts.
+
+    python bench/loadtest.py --concurrency 1,8,32 --requests 200 --output bench.json
+    python bench/loadtest.py --compare bench.json --fail-threshold 0.2
+
+Event-loop lag is sampled as the latency of GET / while the load runs:
+the handler does no work, so anything above loopback time is time spent
+waiting for the app's event loop.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from stubs import ServerThread, free_port, make_openai_stub, make_telegram_stub  # noqa: E402
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ENDPOINTS = ("chat", "chat-stream", "check-phone", "telegram-webhook")
+LINKED_PHONES = 50
+
+FIRST_TURNS = (
+    "Looking for a place in Cairo next weekend for 2 adults",
+    "Zamalek, July 12-15, 3 adults and a baby",
+    "Any apartments in Maadi tomorrow for 4 nights? 2 adults, 2 kids",
+    "عايز شقة في الزمالك من 12 إلى 15 يوليو لـ 3 بالغين",
+    "New Cairo for a week from next Monday, family of 5 people with a dog",
+)
+FOLLOW_UPS = (
+    "Make it 3 adults please",
+    "What about Heliopolis instead?",
+    "Can we move it to next month?",
+    "Is it quiet at night?",
+)
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    k = (len(values) - 1) * p
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def summarize(values):
+    return {
+        "p50": percentile(values, 0.50),
+        "p95": percentile(values, 0.95),
+        "p99": percentile(values, 0.99),
+        "max": max(values) if values else None,
+        "mean": sum(values) / len(values) if values else None,
+    }
+
+
+def rss_mb(pid: int):
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def phone_for(i: int) -> str:
+    return f"2010{i:08d}"
+
+
+class Workload:
+    """Builds the requests for one endpoint; each virtual user keeps its own chat session."""
+
+    def __init__(self, endpoint: str, turns: int):
+        self.endpoint = endpoint
+        self.turns = turns
+        self.update_id = random.randint(1, 10 ** 6)
+
+    def new_user(self):
+        return {"session_id": str(uuid.uuid4()), "turn": 0}
+
+    def next_request(self, user):
+        if self.endpoint in ("chat", "chat-stream"):
+            if user["turn"] >= self.turns:
+                user.update(self.new_user())
+            message = random.choice(FIRST_TURNS if user["turn"] == 0 else FOLLOW_UPS)
+            user["turn"] += 1
+            path = "/chat" if self.endpoint == "chat" else "/chat/stream"
+            body = {
+                "message": message,
+                "lang": "ar" if any("؀" <= ch <= "ۿ" for ch in message) else "en",
+                "session_id": user["session_id"],
+                "phone": phone_for(random.randrange(LINKED_PHONES * 2)),
+            }
+            return path, body
+
+        if self.endpoint == "check-phone":
+            return "/check-phone", {"phone": "+" + phone_for(random.randrange(LINKED_PHONES * 2))}
+
+        self.update_id += 1
+        chat_id = random.randrange(10 ** 6, 10 ** 7)
+        if random.random() < 0.5:
+            message = {"message_id": 1, "chat": {"id": chat_id, "type": "private"}, "text": "/start"}
+        else:
+            message = {"message_id": 1, "chat": {"id": chat_id, "type": "private"},
+                       "contact": {"phone_number": "+" + phone_for(random.randrange(10 ** 6)), "user_id": chat_id}}
+        return "/telegram-webhook", {"update_id": self.update_id, "message": message}
+
+
+async def probe_loop_lag(client: httpx.AsyncClient, samples: list, stop: asyncio.Event, interval: float = 0.1):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            await client.get("/")
+            samples.append((time.perf_counter() - start) * 1000)
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_level(app_url, endpoint, concurrency, total, turns, headers):
+    workload = Workload(endpoint, turns)
+    latencies, first_token = [], []
+    counts = {"ok": 0, "errors": 0, "rejected": 0}
+    remaining = [total]
+
+    limits = httpx.Limits(max_connections=concurrency + 4)
+    async with httpx.AsyncClient(base_url=app_url, timeout=120, limits=limits, headers=headers) as client, \
+            httpx.AsyncClient(base_url=app_url, timeout=30) as probe_client:
+
+        async def user_loop():
+            user = workload.new_user()
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                path, body = workload.next_request(user)
+                start = time.perf_counter()
+                try:
+                    failed = False
+                    if endpoint == "chat-stream":
+                        first = None
+                        async with client.stream("POST", path, json=body) as resp:
+                            async for line in resp.aiter_lines():
+                                if first is None and line.startswith("event: token"):
+                                    first = (time.perf_counter() - start) * 1000
+                                # Errors after the 200 arrive as an error event
+                                failed = failed or line.startswith("event: error")
+                            status = resp.status_code
+                        if first is not None:
+                            first_token.append(first)
+                    else:
+                        status = (await client.post(path, json=body)).status_code
+                except httpx.HTTPError:
+                    counts["errors"] += 1
+                    continue
+                latencies.append((time.perf_counter() - start) * 1000)
+                if status == 503:
+                    counts["rejected"] += 1
+                elif status >= 400 or failed:
+                    counts["errors"] += 1
+                else:
+                    counts["ok"] += 1
+
+        lag = []
+        stop = asyncio.Event()
+        prober = asyncio.create_task(probe_loop_lag(probe_client, lag, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(user_loop() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await prober
+
+    result = {
+        "requests": total,
+        **counts,
+        "elapsed_s": elapsed,
+        "throughput_rps": counts["ok"] / elapsed if elapsed else None,
+        "latency_ms": summarize(latencies),
+        "loop_lag_ms": summarize(lag),
+    }
+    if first_token:
+        result["first_token_ms"] = summarize(first_token)
+    return result
+
+
+def start_app(openai_url, telegram_url, workdir, extra_env):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "OPENAI_API_KEY": "bench",
+        "OPENAI_BASE_URL": f"{openai_url}/v1",
+        "TELEGRAM_BOT_TOKEN": "bench",
+        "TELEGRAM_API_BASE": telegram_url,
+        "PYTHONUNBUFFERED": "1",
+    })
+    env.update(extra_env)
+    log = open(os.path.join(workdir, "app.log"), "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--app-dir", REPO,
+         "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"App exited during startup, see {log.name}")
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    proc.terminate()
+    raise RuntimeError("App did not start within 30s")
+
+
+def metric_value(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.split()[1])
+    return 0.0
+
+
+def wait_for_drain(app_url, telegram_stub, timeout: float = 120):
+    """Wait until the app's update and send queues are empty and the Telegram stub has stopped receiving.
+
+    Sends are paced per chat, so a level can leave messages queued well after
+    its last response; counting before they land would credit them to the next level.
+    """
+    deadline = time.time() + timeout
+    last_count, stable_since = None, time.time()
+    with httpx.Client(base_url=app_url, timeout=10) as client:
+        while time.time() < deadline:
+            metrics = client.get("/metrics").text
+            depth = (metric_value(metrics, "chatbot_telegram_queue_depth")
+                     + metric_value(metrics, "chatbot_telegram_update_queue_depth"))
+            count = len(telegram_stub.state.messages)
+            if count != last_count:
+                last_count, stable_since = count, time.time()
+            # An update being handled is off its queue before its replies are queued, so also wait for quiet
+            if depth == 0 and time.time() - stable_since >= 0.5:
+                return
+            time.sleep(0.1)
+    print(f"  ⚠️ Telegram queues not drained after {timeout:.0f}s; outbound counts may spill into the next level")
+
+
+def link_phones(app_url, headers):
+    # Give the chat load real Telegram recipients for half of its phone numbers
+    with httpx.Client(base_url=app_url, timeout=30, headers=headers) as client:
+        for i in range(LINKED_PHONES):
+            client.post("/telegram-webhook", json={"update_id": 10 ** 8 + i, "message": {
+                "message_id": 1, "chat": {"id": 5000 + i, "type": "private"},
+                "contact": {"phone_number": "+" + phone_for(i), "user_id": 5000 + i},
+            }})
+
+
+def compare(report, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    base = {(r["endpoint"], r["concurrency"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nCompared with {baseline_path} ({baseline['meta'].get('commit')}):")
+    for r in report["results"]:
+        b = base.get((r["endpoint"], r["concurrency"]))
+        if not b or not b["throughput_rps"] or not b["latency_ms"]["p95"]:
+            continue
+        rps = r["throughput_rps"] / b["throughput_rps"] - 1
+        p95 = r["latency_ms"]["p95"] / b["latency_ms"]["p95"] - 1
+        print(f"  {r['endpoint']:<17} c={r['concurrency']:<4} throughput {rps:+.1%}  p95 {p95:+.1%}")
+        if threshold is not None and (rps < -threshold or p95 > threshold):
+            regressions.append((r["endpoint"], r["concurrency"]))
+    return regressions
+
+
+def print_result(r):
+    lat, lag = r["latency_ms"], r["loop_lag_ms"]
+    fmt = lambda v: "-" if v is None else f"{v:.1f}"  # noqa: E731
+    print(f"  {r['endpoint']:<17} c={r['concurrency']:<4} {fmt(r['throughput_rps']):>7} req/s  "
+          f"p50 {fmt(lat['p50'])}  p95 {fmt(lat['p95'])}  p99 {fmt(lat['p99'])} ms  "
+          f"lag p99 {fmt(lag['p99'])} ms  rss +{fmt(r['rss_mb']['growth'])} MB  "
+          f"openai {r['outbound']['openai']}  telegram {r['outbound']['telegram']}  "
+          f"err {r['errors']}  503 {r['rejected']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--concurrency", default="1,8,32,64")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and level")
+    parser.add_argument("--turns", type=int, default=3, help="chat turns per session")
+    parser.add_argument("--llm-latency", type=float, default=0.3)
+    parser.add_argument("--token-delay", type=float, default=0.005)
+    parser.add_argument("--telegram-latency", type=float, default=0.05)
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the app, e.g. --env LLM_MAX_CONCURRENCY=8")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--fail-threshold", type=float, default=None,
+                        help="exit 1 if throughput drops or p95 rises by more than this fraction")
+    args = parser.parse_args()
+
+    endpoints = [e for e in args.endpoints.split(",") if e]
+    levels = [int(c) for c in args.concurrency.split(",") if c]
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    headers = {}
+    if extra_env.get("TELEGRAM_WEBHOOK_SECRET"):
+        headers["X-Telegram-Bot-Api-Secret-Token"] = extra_env["TELEGRAM_WEBHOOK_SECRET"]
+
+    openai_stub = make_openai_stub(args.llm_latency, args.token_delay)
+    telegram_stub = make_telegram_stub(args.telegram_latency)
+    openai_server = ServerThread(openai_stub).start()
+    telegram_server = ServerThread(telegram_stub).start()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+        },
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        proc, app_url = start_app(openai_server.url, telegram_server.url, workdir, extra_env)
+        try:
+            link_phones(app_url, headers)
+            wait_for_drain(app_url, telegram_stub)
+            print(f"Benchmarking {app_url} (openai stub {openai_server.url}, telegram stub {telegram_server.url})")
+            for endpoint in endpoints:
+                for concurrency in levels:
+                    rss_before = rss_mb(proc.pid)
+                    openai_before = openai_stub.state.calls
+                    telegram_before = len(telegram_stub.state.messages)
+
+                    result = asyncio.run(run_level(app_url, endpoint, concurrency, args.requests,
+                                                   args.turns, headers))
+                    # Let queued Telegram sends land before counting them
+                    wait_for_drain(app_url, telegram_stub)
+
+                    rss_after = rss_mb(proc.pid)
+                    result = {"endpoint": endpoint, "concurrency": concurrency, **result}
+                    result["rss_mb"] = {
+                        "start": rss_before,
+                        "end": rss_after,
+                        "growth": rss_after - rss_before if rss_before and rss_after else None,
+                    }
+                    result["outbound"] = {
+                        "openai": openai_stub.state.calls - openai_before,
+                        "telegram": len(telegram_stub.state.messages) - telegram_before,
+                    }
+                    report["results"].append(result)
+                    print_result(result)
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+            openai_server.stop()
+            telegram_server.stop()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.output}")
+
+    if args.compare:
+        regressions = compare(report, args.compare, args.fail_threshold)
+        if regressions:
+            print(f"\n❌ Regressions beyond {args.fail_threshold:.0%}: {regressions}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Local stand-ins for the OpenAI and Telegram Bot APIs used by the load tests.
+
+Run one on its own with:
+
+    python bench/stubs.py openai --port 9001 --latency 0.5
+    python bench/stubs.py telegram --port 9002
+"""
+import argparse
+import asyncio
+import json
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = (
+    "Welcome! Cairo is a great choice.\n\n"
+    "**Zamalek** is a leafy Nile island with cafés, galleries and quiet streets.\n"
+    "**Maadi** is a green, relaxed district popular with families.\n"
+    "**New Cairo** offers modern compounds, malls and easy parking."
+)
+
+
+def make_openai_stub(latency: float = 0.3, token_delay: float = 0.01, reply: str = REPLY):
+    """OpenAI-compatible /v1/chat/completions with fixed latency and optional streaming."""
+    app = FastAPI()
+    app.state.calls = 0
+    app.state.streamed = 0
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        prompt_tokens = sum(len(m.get("content") or "") // 4 for m in body.get("messages", []))
+        completion_tokens = len(reply) // 4
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await asyncio.sleep(latency)
+            return {
+                "id": f"chatcmpl-stub-{app.state.calls}",
+                "object": "chat.completion",
+                "created": created,
+                "model": body.get("model", "gpt-4o"),
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": reply},
+                             "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+
+        app.state.streamed += 1
+
+        async def events():
+            await asyncio.sleep(latency)
+            for word in reply.split(" "):
+                chunk = {
+                    "id": f"chatcmpl-stub-{app.state.calls}", "object": "chat.completion.chunk",
+                    "created": created, "model": body.get("model", "gpt-4o"),
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(token_delay)
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def make_telegram_stub(latency: float = 0.05):
+    """Telegram Bot API stub that records every sendMessage call."""
+    app = FastAPI()
+    app.state.messages = []
+
+    @app.post("/bot{token}/sendMessage")
+    async def send_message(token: str, request: Request):
+        payload = await request.json()
+        await asyncio.sleep(latency)
+        app.state.messages.append(payload)
+        return JSONResponse({"ok": True, "result": {
+            "message_id": len(app.state.messages),
+            "chat": {"id": payload.get("chat_id")},
+            "date": int(time.time()),
+            "text": payload.get("text", ""),
+        }})
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class ServerThread:
+    """Run an ASGI app with uvicorn on a background thread."""
+
+    def __init__(self, app, port: int = None):
+        self.app = app
+        self.port = port or free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def stop(self):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("service", choices=("openai", "telegram"))
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency", type=float, default=None)
+    parser.add_argument("--token-delay", type=float, default=0.01)
+    args = parser.parse_args()
+
+    if args.service == "openai":
+        stub = make_openai_stub(0.3 if args.latency is None else args.latency, args.token_delay)
+    else:
+        stub = make_telegram_stub(0.05 if args.latency is None else args.latency)
+    uvicorn.run(stub, host="127.0.0.1", port=args.port)
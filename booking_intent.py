@@ -0,0 +1,493 @@
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from urllib.parse import urlencode
+
+DEFAULT_NIGHTS = 3
+MAX_AREAS = 3
+
+# --- Area catalogue ---
+
+@dataclass(frozen=True)
+class Area:
+    name: str
+    city: str
+    name_ar: str
+    aliases: tuple = ()
+
+    @property
+    def slug(self):
+        return f"{self.city}--{self.name}".replace(" ", "-")
+
+
+AREAS = (
+    Area("Zamalek", "Cairo", "الزمالك"),
+    Area("Maadi", "Cairo", "المعادي", ("el maadi",)),
+    Area("New Cairo", "Cairo", "القاهرة الجديدة", ("fifth settlement", "5th settlement", "التجمع", "التجمع الخامس")),
+    Area("Heliopolis", "Cairo", "مصر الجديدة", ("masr el gedida",)),
+    Area("Garden City", "Cairo", "جاردن سيتي"),
+    Area("Downtown", "Cairo", "وسط البلد", ("downtown cairo", "wust el balad")),
+    Area("Nasr City", "Cairo", "مدينة نصر"),
+    Area("Mohandessin", "Giza", "المهندسين", ("mohandeseen",)),
+    Area("Dokki", "Giza", "الدقي"),
+    Area("Sheikh Zayed", "Giza", "الشيخ زايد", ("zayed",)),
+    Area("6th of October", "Giza", "السادس من أكتوبر", ("october city", "6 october", "6th october", "مدينة أكتوبر")),
+    Area("Pyramids", "Giza", "الأهرامات", ("giza pyramids", "الهرم")),
+)
+
+CITIES = {"Cairo": ("cairo", "القاهرة", "القاهره", "مصر"), "Giza": ("giza", "الجيزة", "الجيزه")}
+# Recognised so they aren't mistaken for Cairo, but there are no areas or links for them
+OTHER_CITIES = {
+    "Alexandria": ("alexandria", "الإسكندرية", "الاسكندرية", "اسكندرية", "إسكندرية"),
+    "Hurghada": ("hurghada", "الغردقة", "الغردقه"),
+    "Sharm El Sheikh": ("sharm el sheikh", "sharm", "شرم الشيخ", "شرم"),
+    "Luxor": ("luxor", "الأقصر", "الاقصر"),
+    "Aswan": ("aswan", "أسوان", "اسوان"),
+    "Dahab": ("dahab", "دهب"),
+    "El Gouna": ("el gouna", "gouna", "الجونة", "الجونه"),
+    "Marsa Alam": ("marsa alam", "مرسى علم", "مرسي علم"),
+    "North Coast": ("north coast", "sahel", "الساحل الشمالي", "الساحل"),
+    "Ain Sokhna": ("ain sokhna", "sokhna", "العين السخنة", "السخنة", "السخنه"),
+}
+
+
+def _alias_pattern(names):
+    names = sorted(names, key=len, reverse=True)
+    return re.compile(r"(?<!\w)(" + "|".join(re.escape(n) for n in names) + r")(?!\w)", re.I)
+
+
+_area_by_alias = {}
+for _area in AREAS:
+    for _alias in (_area.name, _area.name_ar) + _area.aliases:
+        _area_by_alias[_alias.lower()] = _area
+_area_re = _alias_pattern(_area_by_alias)
+_city_by_alias = {alias: city for cities in (CITIES, OTHER_CITIES) for city, aliases in cities.items()
+                  for alias in aliases}
+_city_re = _alias_pattern(_city_by_alias)
+
+
+def find_areas(text: str) -> list:
+    """Catalogue areas mentioned in text, in order of first appearance."""
+    found = []
+    for match in _area_re.finditer(text or ""):
+        area = _area_by_alias[match.group(1).lower()]
+        if area not in found:
+            found.append(area)
+    return found
+
+
+def area_names(city: str = None) -> list:
+    return [a.name for a in AREAS if city in (None, a.city)]
+
+
+def is_catalogued(city: str) -> bool:
+    return city in CITIES
+
+
+# --- Dates ---
+
+MONTHS = {
+    "january": 1, "jan": 1, "february": 2, "feb": 2, "march": 3, "mar": 3, "april": 4, "apr": 4,
+    "may": 5, "june": 6, "jun": 6, "july": 7, "jul": 7, "august": 8, "aug": 8,
+    "september": 9, "sept": 9, "sep": 9, "october": 10, "oct": 10, "november": 11, "nov": 11,
+    "december": 12, "dec": 12,
+    "يناير": 1, "فبراير": 2, "مارس": 3, "أبريل": 4, "ابريل": 4, "إبريل": 4, "مايو": 5, "يونيو": 6,
+    "يوليو": 7, "أغسطس": 8, "اغسطس": 8, "سبتمبر": 9, "أكتوبر": 10, "اكتوبر": 10, "نوفمبر": 11,
+    "ديسمبر": 12,
+}
+WEEKDAYS = {
+    "monday": 0, "tuesday": 1, "wednesday": 2, "thursday": 3, "friday": 4, "saturday": 5, "sunday": 6,
+    "الاثنين": 0, "الإثنين": 0, "التلات": 1, "الثلاثاء": 1, "الأربعاء": 2, "الاربعاء": 2, "الخميس": 3,
+    "الجمعة": 4, "الجمعه": 4, "السبت": 5, "الأحد": 6, "الاحد": 6,
+}
+
+_month = "(" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+_day = r"(\d{1,2})(?:st|nd|rd|th)?"
+_year = r"(?:,?\s*(\d{4}))?"
+_to = r"\s*(?:-|–|—|to|till|until|through|إلى|الى|لحد|ل)\s*"
+
+_date_patterns = (
+    # July 12-15, July 12 to August 2
+    ("md_range", re.compile(rf"(?<!\w){_month}\s+{_day}{_to}(?:{_month}\s+)?{_day}(?!\w){_year}", re.I)),
+    # 12-15 July, 12 to 15 of July
+    ("dm_range", re.compile(rf"(?<!\d){_day}{_to}{_day}\s+(?:of\s+)?{_month}(?!\w){_year}", re.I)),
+    ("iso", re.compile(r"(?<!\d)(\d{4})-(\d{1,2})-(\d{1,2})(?!\d)")),
+    ("md", re.compile(rf"(?<!\w){_month}\s+{_day}(?!\w){_year}", re.I)),
+    ("dm", re.compile(rf"(?<!\d){_day}\s+(?:of\s+)?{_month}(?!\w){_year}", re.I)),
+    # Day-first numeric dates, as written in Egypt
+    ("numeric", re.compile(r"(?<![\d/])(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?(?![\d/])")),
+)
+
+_nights_re = re.compile(
+    r"(?<!in )(?<!بعد )(?<!\d)(\d{1,2})\s*(nights?|days?|ليالي|ليالى|ليال|ليلة|ليله|أيام|ايام|يوم)(?!\w)", re.I)
+_weeks_re = re.compile(r"(?<!next )(?<!this )\b(a|one|1|two|2)\s+weeks?\b|(?<!\w)(أسبوع|اسبوع|أسبوعين|اسبوعين)(?!\s*(?:الجاي|القادم|الجاية|اللي جاي))", re.I)
+_in_days_re = re.compile(r"(?:\bin|بعد)\s+(\d{1,2})\s*(?:days?|أيام|ايام|يوم)", re.I)
+_weekday_re = _alias_pattern(WEEKDAYS)
+# Words that make "today" or "May 3" about a stay rather than small talk
+_travel_re = re.compile(
+    r"\b(?:stay(?:ing|s)?|book(?:ing)?|reserv(?:e|ation)|place|apartments?|apt|flats?|rooms?|hotels?|airbnb|"
+    r"villas?|studio|accommodation|check[- ]?in|arriv(?:e|ing|al)|visit(?:ing)?|trip|travel(?:l?ing)?|"
+    r"holiday|vacation|rent(?:al|ing)?|nights?)\b"
+    r"|(?<!\w)(?:شقة|شقه|شقق|حجز|أحجز|احجز|إقامة|اقامة|ليلة|ليله|ليالي|ليالى|غرفة|غرفه|أوضة|اوضة|فندق|سفر|"
+    r"رحلة|رحله|أسافر|اسافر|زيارة|أزور|ازور|إجازة|اجازة|أجازة|نازل|نازلين|هننزل|إيجار|ايجار|سكن)(?!\w)", re.I)
+
+_ARABIC_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+
+
+def _resolve(year, month, day, today: date):
+    """Build a date, rolling an omitted year forward so the date isn't in the past."""
+    try:
+        if year:
+            year = int(year)
+            return date(year + 2000 if year < 100 else year, month, day)
+        resolved = date(today.year, month, day)
+        if resolved < today:
+            resolved = date(today.year + 1, month, day)
+        return resolved
+    except ValueError:
+        return None
+
+
+def _explicit_dates(text: str, today: date) -> list:
+    """Explicit dates in order of appearance, as (kind, [dates]) pairs."""
+    taken = []
+    found = []
+    for kind, pattern in _date_patterns:
+        for m in pattern.finditer(text):
+            if any(m.start() < end and start < m.end() for start, end in taken):
+                continue
+            # "may 3 people" is a guest count, not May 3rd
+            if _guest_noun_re.match(text, m.end()):
+                continue
+            g = m.groups()
+            if kind == "md_range":
+                month = MONTHS[g[0].lower()]
+                end_month = MONTHS[g[2].lower()] if g[2] else month
+                dates = [_resolve(g[4], month, int(g[1]), today), _resolve(g[4], end_month, int(g[3]), today)]
+            elif kind == "dm_range":
+                month = MONTHS[g[2].lower()]
+                dates = [_resolve(g[3], month, int(g[0]), today), _resolve(g[3], month, int(g[1]), today)]
+            elif kind == "iso":
+                dates = [_resolve(g[0], int(g[1]), int(g[2]), today)]
+            elif kind == "md":
+                dates = [_resolve(g[2], MONTHS[g[0].lower()], int(g[1]), today)]
+            elif kind == "dm":
+                dates = [_resolve(g[2], MONTHS[g[1].lower()], int(g[0]), today)]
+            else:
+                dates = [_resolve(g[2], int(g[1]), int(g[0]), today)]
+            dates = [d for d in dates if d]
+            if dates:
+                taken.append(m.span())
+                found.append((m.start(), kind, dates))
+    return [(kind, dates) for _, kind, dates in sorted(found, key=lambda x: x[0])]
+
+
+def _weekend(today: date, weeks_ahead: int = 0) -> date:
+    # Egypt's weekend is Friday–Saturday, so a weekend stay starts Thursday
+    days = (3 - today.weekday()) % 7
+    if today.weekday() == 4:  # already Friday: start today
+        days = 0
+    return today + timedelta(days=days + 7 * weeks_ahead)
+
+
+def _relative_checkin(text: str, today: date):
+    t = text.lower()
+    if re.search(r"day after tomorrow|بعد بكر[ةه]|بعد غد", t):
+        return today + timedelta(days=2), None
+    if re.search(r"next weekend|(?:الويكند|الويك اند|ويك اند|نهاية الأسبوع|نهاية الاسبوع)\s*(?:الجاي|القادم|اللي جاي)", t):
+        return _weekend(today, 1), 2
+    if re.search(r"weekend|الويكند|الويك اند|ويك اند|نهاية الأسبوع|نهاية الاسبوع", t):
+        return _weekend(today), 2
+    if re.search(r"\btomorrow\b|بكر[ةه]|غدا|غداً", t):
+        return today + timedelta(days=1), None
+    if re.search(r"\btoday\b|\btonight\b|النهارد[ةه]|الليلة|الليله|اليوم", t):
+        return today, None
+    if re.search(r"next week|(?:الأسبوع|الاسبوع)\s*(?:الجاي|القادم|اللي جاي)", t):
+        return today + timedelta(days=7 - today.weekday()), None
+    if re.search(r"next month|الشهر\s*(?:الجاي|القادم|اللي جاي)", t):
+        first = date(today.year + today.month // 12, today.month % 12 + 1, 1)
+        return first, None
+    m = _in_days_re.search(t)
+    if m:
+        return today + timedelta(days=int(m.group(1))), None
+    m = _weekday_re.search(t)
+    if m:
+        days = (WEEKDAYS[m.group(1).lower()] - today.weekday()) % 7 or 7
+        return today + timedelta(days=days), None
+    return None, None
+
+
+def _nights(text: str):
+    m = _nights_re.search(text)
+    if m:
+        return int(m.group(1)) or None
+    m = _weeks_re.search(text)
+    if m:
+        word = (m.group(1) or m.group(2)).lower()
+        return 14 if word in ("two", "2", "أسبوعين", "اسبوعين") else 7
+    return None
+
+
+def _mask(text: str, *patterns) -> str:
+    """Blank out matches of the patterns, keeping the other characters where they were."""
+    for pattern in patterns:
+        text = pattern.sub(lambda m: " " * len(m.group(0)), text)
+    return text
+
+
+def has_travel_context(text: str) -> bool:
+    """Whether text is about a stay: a lodging or trip word, a place, or a guest count."""
+    text = (text or "").translate(_ARABIC_DIGITS)
+    return bool(_travel_re.search(text) or _city_re.search(text) or _area_re.search(text)
+                or _guest_re.search(text) or _dual_re.search(text))
+
+
+def parse_dates(text: str, today: date, context: bool = None):
+    """Return (checkin, checkout) found in text, either of which may be None.
+
+    A date range ("July 12-15") is taken as it stands. A single date or a
+    relative phrase ("today", "next week") only counts in a travel context;
+    ``context`` says whether the caller already knows there is one, and when
+    None the text itself is checked.
+    """
+    text = (text or "").translate(_ARABIC_DIGITS)
+    if context is None:
+        context = has_travel_context(text)
+    # Place names aren't dates: "6th of October" is an area, not October 6th
+    text = _mask(text, _area_re, _city_re)
+    found = _explicit_dates(text, today)
+    if not context:
+        found = [(kind, dates) for kind, dates in found if kind in ("md_range", "dm_range")]
+        if not found:
+            return None, None
+    dates = [d for _, ds in found for d in ds]
+    nights = _nights(text)
+    checkin = checkout = None
+    if dates:
+        checkin = dates[0]
+        if len(dates) > 1:
+            checkout = dates[1]
+            # "Dec 30 - Jan 2" without a year: the end rolls into the next year
+            if checkout <= checkin and checkout.replace(year=checkout.year + 1) > checkin:
+                checkout = checkout.replace(year=checkout.year + 1)
+    else:
+        checkin, default_nights = _relative_checkin(text, today)
+        nights = nights or default_nights
+    if checkin and not checkout and nights:
+        checkout = checkin + timedelta(days=nights)
+    return checkin, checkout
+
+
+# --- Guests ---
+
+NUMBER_WORDS = {
+    "a": 1, "an": 1, "one": 1, "single": 1, "my": 1, "our": 1, "two": 2, "three": 3, "four": 4,
+    "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "واحد": 1, "واحدة": 1, "اتنين": 2, "اثنين": 2, "إثنين": 2, "اثنان": 2, "تلاتة": 3, "ثلاثة": 3,
+    "تلات": 3, "ثلاث": 3, "أربعة": 4, "اربعة": 4, "أربع": 4, "اربع": 4, "خمسة": 5, "خمس": 5,
+    "ستة": 6, "ست": 6,
+}
+GUEST_WORDS = {
+    "adults": ("adult", "adults", "grown-ups", "grownups", "teen", "teens", "teenager", "teenagers",
+               "بالغ", "بالغين", "كبار", "شخص بالغ"),
+    "total": ("people", "persons", "person", "guests", "guest", "pax", "travelers", "travellers",
+              "أشخاص", "اشخاص", "أفراد", "افراد", "نفر", "ضيوف"),
+    "children": ("child", "children", "kid", "kids", "أطفال", "اطفال", "طفل", "عيال", "ولاد", "أولاد"),
+    "infants": ("infant", "infants", "baby", "babies", "toddler", "toddlers", "newborn",
+                "رضيع", "رضع", "بيبي", "بيبى"),
+    "pets": ("pet", "pets", "dog", "dogs", "cat", "cats", "puppy", "puppies", "kitten", "kittens",
+             "كلب", "كلاب", "قطة", "قطه", "قطط", "حيوان أليف", "حيوانات أليفة"),
+}
+# Arabic dual nouns carry their own count
+DUALS = {"طفلين": "children", "كلبين": "pets", "قطتين": "pets", "رضيعين": "infants", "شخصين": "total"}
+
+_guest_kind = {w.lower(): kind for kind, words in GUEST_WORDS.items() for w in words}
+_count = "(" + r"\d{1,2}|" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True)) + ")"
+_guest_re = re.compile(
+    # Arabic "and" is written attached to the next word: "و2 أطفال"
+    rf"(?:(?<!\w)|(?<=و)){_count}\s+(?:(?:little|small|young|older|adult|صغير|صغيرين)\s+)?"
+    rf"({'|'.join(sorted(map(re.escape, _guest_kind), key=len, reverse=True))})(?!\w)", re.I)
+_dual_re = re.compile(r"(?:(?<!\w)|(?<=و))(" + "|".join(DUALS) + r")(?!\w)")
+_guest_noun_re = re.compile(
+    rf"\s*(?:(?:little|small|young|older|adult)\s+)?({'|'.join(sorted(map(re.escape, _guest_kind), key=len, reverse=True))})(?!\w)",
+    re.I)
+_couple_re = re.compile(r"\b(?:couple|my (?:wife|husband|partner|girlfriend|boyfriend))\b|أنا ومراتي|انا ومراتي|أنا وجوزي|انا وجوزي", re.I)
+
+
+def parse_guests(text: str) -> dict:
+    """Guest and pet counts stated in text; keys are only present when stated."""
+    text = (text or "").translate(_ARABIC_DIGITS)
+    counts = {}
+    for m in _dual_re.finditer(text):
+        kind = DUALS[m.group(1)]
+        counts[kind] = counts.get(kind, 0) + 2
+    for m in _guest_re.finditer(text):
+        raw, noun = m.group(1).lower(), m.group(2).lower()
+        # "my dog" is one pet, "my kids" says nothing about how many
+        if raw in ("my", "our") and noun.endswith(("s", "ren", "ple")):
+            continue
+        kind = _guest_kind[noun]
+        n = int(raw) if raw.isdigit() else NUMBER_WORDS[raw]
+        counts[kind] = counts.get(kind, 0) + n
+
+    total = counts.pop("total", None)
+    if "adults" not in counts:
+        if total:
+            counts["adults"] = max(1, total - counts.get("children", 0) - counts.get("infants", 0))
+        elif _couple_re.search(text):
+            counts["adults"] = 2
+    return counts
+
+
+# --- Intent and links ---
+
+GUEST_LABELS = {"adults": "adults", "children": "children", "infants": "infants", "pets": "pets"}
+GUEST_LABELS_AR = {"adults": "بالغين", "children": "أطفال", "infants": "رضع", "pets": "حيوانات أليفة"}
+
+
+@dataclass
+class BookingIntent:
+    city: str = None
+    areas: list = field(default_factory=list)
+    checkin: date = None
+    checkout: date = None
+    adults: int = 2
+    children: int = 0
+    infants: int = 0
+    pets: int = 0
+    found: bool = False  # any booking detail was mentioned
+
+    def guests_text(self):
+        return (f"{self.adults} adults, {self.children} children, "
+                f"{self.infants} infants, {self.pets} pets")
+
+    def facts(self) -> dict:
+        """The resolved details as string facts, saved with the session and passed back as ``base``."""
+        if not self.found:
+            return {}
+        facts = {
+            "city": self.city,
+            "areas": ", ".join(a.name for a in self.areas),
+            "checkin": self.checkin and self.checkin.isoformat(),
+            "checkout": self.checkout and self.checkout.isoformat(),
+            "adults": self.adults, "children": self.children, "infants": self.infants, "pets": self.pets,
+        }
+        return {key: str(value) for key, value in facts.items() if value is not None and value != ""}
+
+    def summary_line(self, lang: str = "en") -> str:
+        """Dates and guests shown above the reply, so the model text doesn't depend on them."""
+        if not self.found:
+            return ""
+        labels = GUEST_LABELS_AR if lang == "ar" else GUEST_LABELS
+        guests = [f"{getattr(self, key)} {label}" for key, label in labels.items()
+                  if key == "adults" or getattr(self, key)]
+        parts = [("، " if lang == "ar" else ", ").join(guests)]
+        if self.checkin and self.checkout:
+            parts.insert(0, f"{self.checkin.isoformat()} → {self.checkout.isoformat()}")
+        return "📅 " + " · ".join(parts)
+
+    def prompt_context(self, today: date, lang: str = "en") -> str:
+        """Per-turn instructions for the model; the parsing has already been done here."""
+        lines = [f"Today is {today.strftime('%B %d, %Y')}."]
+        if self.found:
+            dates = (f"{self.checkin:%B %d, %Y} to {self.checkout:%B %d, %Y}"
+                     if self.checkin and self.checkout else "not given")
+            lines.append(f"Parsed booking details: city {self.city or 'not given'}; dates {dates}; "
+                         f"{self.guests_text()}. "
+                         "These are shown to the guest separately, so don't restate dates or guest counts.")
+            if self.areas:
+                lines.append("Areas discussed so far: " + ", ".join(a.name for a in self.areas) + ".")
+            if self.city and not is_catalogued(self.city):
+                lines.append(f"{self.city} is outside our Greater Cairo area list and no booking links will be "
+                             f"added, so don't suggest Cairo or Giza areas instead; recommend 2–3 areas in "
+                             f"{self.city} from general knowledge, each with a one or two sentence description.")
+            else:
+                lines.append("For Greater Cairo, recommend 2–3 areas chosen only from: " + ", ".join(area_names()) +
+                             ". Give each a one or two sentence description, starting with the area name in bold.")
+        if lang == "ar":
+            lines.append("Reply in Arabic.")
+        return " ".join(lines)
+
+
+def _int(value, default):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _iso(value):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def extract_intent(message: str, today: date, base: dict = None) -> BookingIntent:
+    """Parse the booking intent of a message on top of facts known from earlier turns.
+
+    ``base`` uses the string keys of the session facts summary (city, areas,
+    checkin, checkout, adults, children, infants, pets).
+    """
+    base = base or {}
+    intent = BookingIntent(
+        city=base.get("city"),
+        areas=find_areas(base.get("areas", "")),
+        checkin=_iso(base.get("checkin")),
+        checkout=_iso(base.get("checkout")),
+        adults=_int(base.get("adults"), 2),
+        children=_int(base.get("children"), 0),
+        infants=_int(base.get("infants"), 0),
+        pets=_int(base.get("pets"), 0),
+        found=bool(base),
+    )
+    # Dates from an earlier turn that have since passed are no use
+    if intent.checkin and intent.checkin < today:
+        intent.checkin = intent.checkout = None
+
+    areas = find_areas(message)
+    if areas:
+        intent.areas = areas
+        intent.city = areas[0].city
+    city = _city_re.search(message or "")
+    if city:
+        intent.city = _city_by_alias[city.group(1).lower()]
+    if intent.city and not is_catalogued(intent.city):
+        # Areas from an earlier Cairo turn don't apply to a stay elsewhere
+        intent.areas = []
+
+    checkin, checkout = parse_dates(message, today, bool(base or areas or city) or None)
+    # Explicit dates that have already passed ("2025-01-03") are as unusable as stale ones
+    if checkin and checkin >= today:
+        intent.checkin, intent.checkout = checkin, checkout
+    guests = parse_guests(message)
+    for key, value in guests.items():
+        setattr(intent, key, value)
+
+    intent.found = intent.found or bool(areas or city or checkin or guests)
+    return intent
+
+
+def build_airbnb_link(area: Area, intent: BookingIntent, today: date) -> str:
+    """Airbnb search URL for an area; dates are only included when valid and in the future."""
+    params = {}
+    checkin, checkout = intent.checkin, intent.checkout
+    if checkin and checkin >= today:
+        if not checkout or checkout <= checkin:
+            checkout = checkin + timedelta(days=DEFAULT_NIGHTS)
+        params = {"checkin": checkin.isoformat(), "checkout": checkout.isoformat()}
+    params.update(adults=max(1, intent.adults), children=max(0, intent.children),
+                  infants=max(0, intent.infants), pets=max(0, intent.pets))
+    return f"https://www.airbnb.com/s/{area.slug}/homes?{urlencode(params)}"
+
+
+def booking_links(reply: str, intent: BookingIntent, today: date, lang: str = "en") -> list:
+    """(label, url) pairs for the areas the reply recommends, or those the guest asked about."""
+    if not intent.found or (intent.city and not is_catalogued(intent.city)):
+        return []
+    areas = find_areas(reply) or intent.areas
+    links = []
+    for area in areas[:MAX_AREAS]:
+        label = f"استكشف {area.name_ar}" if lang == "ar" else f"Explore {area.name}"
+        links.append((label, build_airbnb_link(area, intent, today)))
+    return links
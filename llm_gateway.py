@@ -0,0 +1,150 @@
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from contextlib import asynccontextmanager
+
+import openai
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 32))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 128))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", 10))
+LLM_DEADLINE = float(os.getenv("LLM_DEADLINE", 60))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 3))
+
+
+class GatewaySaturated(Exception):
+    """Raised when the gateway has no free slot and its queue is full."""
+
+
+def _retryable(e: Exception) -> bool:
+    if isinstance(e, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+
+def _retry_after(e: Exception):
+    response = getattr(e, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def request_key(*parts) -> str:
+    """Stable digest of a request, used to coalesce identical in-flight calls."""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class LLMGateway:
+    """Admission control, deadlines and retries in front of the async OpenAI client.
+
+    At most ``max_concurrency`` upstream calls run at once and at most
+    ``max_queue`` more wait for a slot; anything beyond that is rejected
+    immediately with GatewaySaturated. Calls sharing a coalesce key while
+    one is in flight share its result instead of going upstream again.
+    """
+
+    def __init__(self, client: openai.AsyncOpenAI, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_queue: int = LLM_MAX_QUEUE, queue_timeout: float = LLM_QUEUE_TIMEOUT,
+                 deadline: float = LLM_DEADLINE, max_retries: int = LLM_MAX_RETRIES):
+        # Retries are handled here, with jitter and an overall deadline
+        self.client = client.with_options(max_retries=0)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.in_flight = 0
+        self.waiting = 0
+        self.pending = {}
+        self.stats = {"calls": 0, "retries": 0, "rejected": 0, "coalesced": 0, "timeouts": 0, "errors": 0}
+
+    def saturated(self) -> bool:
+        return self.in_flight + self.waiting >= self.max_concurrency + self.max_queue
+
+    @asynccontextmanager
+    async def _slot(self):
+        if self.saturated():
+            self.stats["rejected"] += 1
+            raise GatewaySaturated("LLM gateway is at capacity")
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected"] += 1
+            raise GatewaySaturated("Timed out waiting for an LLM slot")
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    async def _call(self, deadline_at: float, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            self.stats["calls"] += 1
+            try:
+                return await self.client.chat.completions.create(timeout=remaining, **kwargs)
+            except Exception as e:
+                if not _retryable(e) or attempt == self.max_retries:
+                    self.stats["errors"] += 1
+                    raise
+                delay = _retry_after(e) or min(8.0, 0.5 * 2 ** attempt) * random.uniform(0.5, 1.5)
+                if time.monotonic() + delay >= deadline_at:
+                    self.stats["errors"] += 1
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(delay)
+        self.stats["timeouts"] += 1
+        raise asyncio.TimeoutError("LLM deadline exceeded")
+
+    async def _complete(self, deadline_at: float, **kwargs):
+        async with self._slot():
+            return await self._call(deadline_at, **kwargs)
+
+    async def complete(self, messages: list, model: str = "gpt-4o", coalesce_key: str = None,
+                       deadline: float = None):
+        """Run a chat completion; returns ``(completion, shared)``.
+
+        ``shared`` is True when this caller joined a call already in flight
+        for the same key, so side effects of the reply should be left to the
+        caller that started it.
+        """
+        key = coalesce_key and request_key(coalesce_key, model, messages)
+        if key in self.pending:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(self.pending[key]), True
+
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        # The upstream call is its own task so a cancelled caller doesn't cancel it for the others
+        task = asyncio.ensure_future(self._complete(deadline_at, model=model, messages=messages))
+        if key:
+            self.pending[key] = task
+            task.add_done_callback(lambda _: self.pending.pop(key, None))
+        # Mark the result as retrieved even if every caller went away
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return await asyncio.shield(task), False
+
+    @asynccontextmanager
+    async def stream(self, messages: list, model: str = "gpt-4o", deadline: float = None):
+        """Open a streaming completion; the slot is held until the stream is closed."""
+        deadline_at = time.monotonic() + (deadline or self.deadline)
+        async with self._slot():
+            # include_usage adds a final chunk carrying token counts (with no choices)
+            stream = await self._call(deadline_at, model=model, messages=messages, stream=True,
+                                      stream_options={"include_usage": True})
+            try:
+                yield stream
+            finally:
+                await stream.close()
@@ -2,22 +2,54 @@ from fastapi import FastAPI
 from fastapi import Request
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-import re
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import logging
+import time
 
 import openai
 import os
 from dotenv import load_dotenv
 from uuid import UUID
 from datetime import date
-from datetime import datetime
-import requests
 import json
 
-today = date.today()
-today_str = today.strftime("%B %d, %Y")  # e.g., "July 07, 2025"
+from booking_intent import booking_links, extract_intent
+from llm_gateway import GatewaySaturated, LLMGateway
+from logging_config import setup_logging
+from metrics import registry
+from phone_store import PhoneStore, normalize_phone
+from reply_cache import ReplyCache, intent_key, is_cacheable
+from session_store import is_summary, make_session_store, session_facts, window_history
+from telegram_delivery import TelegramDelivery, split_message
+from telegram_updates import UpdateProcessor
+
 load_dotenv()
+setup_logging()
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+TELEGRAM_API_BASE = os.getenv("TELEGRAM_API_BASE", "https://api.telegram.org")
+# Set the same value as secret_token in setWebhook; Telegram echoes it in a header
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET")
+
+# 📬 Outbound Telegram messages are queued and sent by background workers
+telegram = TelegramDelivery(TELEGRAM_BOT_TOKEN, base_url=TELEGRAM_API_BASE)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if not TELEGRAM_WEBHOOK_SECRET:
+        logger.warning("⚠️ TELEGRAM_WEBHOOK_SECRET is not set; webhook requests are not authenticated")
+    await telegram.start()
+    await telegram_updates.start()
+    yield
+    # Stop update handling first so the replies it queues still go out
+    await telegram_updates.stop()
+    await telegram.stop()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,14 +59,57 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-today = date.today()
-today_str = today.strftime("%B %d, %Y")  # e.g., "July 07, 2025"
+# 📊 Metrics, exposed on /metrics in Prometheus text format
+HTTP_REQUESTS = registry.counter("chatbot_http_requests_total", "HTTP requests handled", ("method", "path", "status"))
+HTTP_SECONDS = registry.histogram("chatbot_http_request_duration_seconds", "Time to produce the response headers", ("method", "path"))
+STAGE_SECONDS = registry.histogram("chatbot_stage_duration_seconds", "Time spent in each stage of a handler", ("endpoint", "stage"))
+LLM_TOKENS = registry.counter("chatbot_llm_tokens_total", "Tokens reported by the model API", ("type",))
+HISTORY_MESSAGES = registry.histogram("chatbot_history_messages", "Messages sent to the model per turn", buckets=(2, 4, 8, 16, 32, 64))
+SESSIONS = registry.gauge("chatbot_sessions", "Sessions currently held by the session store")
+PHONE_LINKS = registry.gauge("chatbot_phone_links", "Phone to Telegram chat links known to this worker")
+TELEGRAM_QUEUE_DEPTH = registry.gauge("chatbot_telegram_queue_depth", "Telegram messages waiting to be sent")
+TELEGRAM_MESSAGES = registry.counter("chatbot_telegram_messages_total", "Telegram delivery outcomes", ("result",))
+TELEGRAM_RESPONSES = registry.counter("chatbot_telegram_responses_total", "sendMessage responses by HTTP status", ("status",))
+LLM_EVENTS = registry.counter("chatbot_llm_gateway_events_total", "LLM gateway calls, retries, rejections and coalescing", ("event",))
+LLM_SLOTS = registry.gauge("chatbot_llm_gateway_slots", "LLM calls running and waiting for a slot", ("state",))
+TELEGRAM_UPDATES = registry.counter("chatbot_telegram_updates_total", "Webhook updates by outcome", ("result",))
+TELEGRAM_UPDATE_QUEUE_DEPTH = registry.gauge("chatbot_telegram_update_queue_depth", "Webhook updates waiting for a worker")
+REPLY_CACHE_EVENTS = registry.counter("chatbot_reply_cache_events_total", "Reply cache hits, misses, bypasses and evictions", ("event",))
+
+def stage(endpoint: str, name: str):
+    return STAGE_SECONDS.time(endpoint=endpoint, stage=name)
+
+def record_usage(usage):
+    if usage:
+        LLM_TOKENS.inc(usage.prompt_tokens, type="prompt")
+        LLM_TOKENS.inc(usage.completion_tokens, type="completion")
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template so path parameters don't explode cardinality
+        route = request.scope.get("route")
+        path = route.path if route else "unmatched"
+        HTTP_REQUESTS.inc(method=request.method, path=path, status=status)
+        HTTP_SECONDS.observe(time.perf_counter() - start, method=request.method, path=path)
+
+# OPENAI_BASE_URL points the app at any OpenAI-compatible server (e.g. the bench stubs)
+client = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL") or None)
 
+# 🚦 Concurrency limits, deadlines, retries and request coalescing for model calls
+llm = LLMGateway(client)
 
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# ♻️ Model-written area descriptions, keyed on booking intent rather than message text
+reply_cache = ReplyCache()
 
-# 🧠 Session memory store
-session_memory = {}
+# 🧠 Session memory store (in-process by default, SESSION_STORE=sqlite to share across workers)
+session_memory = make_session_store()
 
 @app.get("/")
 async def root():
@@ -46,26 +121,28 @@ class ChatRequest(BaseModel):
     session_id: UUID
     phone: str  # <-- new field for the user's phone number
 
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
+# 📇 Phone-to-chat_id mapping, loaded once and kept in memory
+phone_store = PhoneStore(os.getenv("CHAT_ID_STORE_PATH", "chat_id_store.db"))
 
-# Example phone-to-chat_id mapping (you can later load this from a file/db)
 def get_chat_id_by_phone(phone: str):
-    phone = phone.lstrip("+")  # remove leading +
-    try:
-        with open("chat_id_store.json", "r") as f:
-            mapping = json.load(f)
-        return mapping.get(phone)
-    except FileNotFoundError:
-        return None
+    return phone_store.get(phone)
+
+SHARE_PHONE_KEYBOARD = {
+    "keyboard": [[{
+        "text": "📱 Share Phone Number",
+        "request_contact": True
+    }]],
+    "resize_keyboard": True,
+    "one_time_keyboard": True
+}
 
 def send_to_telegram_by_phone(phone: str, text: str, request_contact: bool = False):
     chat_id = get_chat_id_by_phone(phone)
     if not chat_id:
-        print(f"❌ Chat ID not found for phone: {phone}")
+        logger.debug("❌ Chat ID not found for phone", extra={"phone": phone})
         return
 
     # Send plain text or send "Share Phone Number" button
-    url = f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage"
     payload = {
         "chat_id": chat_id,
         "text": text,
@@ -73,182 +150,306 @@ def send_to_telegram_by_phone(phone: str, text: str, request_contact: bool = Fal
     }
 
     if request_contact:
-        keyboard = {
-            "keyboard": [[{
-                "text": "📱 Share Phone Number",
-                "request_contact": True
-            }]],
-            "resize_keyboard": True,
-            "one_time_keyboard": True
-        }
-        payload["reply_markup"] = keyboard
+        payload["reply_markup"] = SHARE_PHONE_KEYBOARD
+
+    # Queued, not sent inline: delivery happens on the background workers
+    telegram.enqueue(payload)
+
+# Dates, guest counts and Airbnb links are handled locally (see booking_intent),
+# so the model only writes the short descriptive text
+SYSTEM_PROMPT = """
+You are the guest communication assistant for a high-end short-term-rental company operating across Cairo, Egypt.
+Be warm, clear and brief. You only answer questions about hotel bookings or vacation stays.
+
+If the guest asks for recommendations: greet them, acknowledge their destination, then recommend 2–3 areas with a short description for each.
+Never write links or URLs; booking links are added after your reply.
+
+If the guest asks about anything non-travel related, respond:
+"I'm sorry, I can only help with hotel bookings and vacation stays. Let me know where you're planning to travel."
+"""
+
+async def start_turn(request: ChatRequest, endpoint: str):
+    with stage(endpoint, "session_load"):
+        # If no session history, start new with system instructions
+        session_messages = await session_memory.aget(request.session_id)
+        if session_messages is None:
+            session_messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+
+        session_messages.append({"role": "user", "content": request.message})
+
+    with stage(endpoint, "intent"):
+        # Parse dates/guests/areas here, on top of the facts the previous turn resolved;
+        # the per-turn context is sent to the model but not stored
+        today = date.today()
+        intent = extract_intent(request.message, today, session_facts(session_messages))
+        context = {"role": "system", "content": intent.prompt_context(today, request.lang)}
+        # Keep the system prompt and recent turns within budget; this turn's facts are saved as a summary
+        session_messages = window_history(session_messages, intent.facts())
+
+    # The model gets the facts through the per-turn context, so the stored summary isn't sent
+    llm_messages = [m for m in session_messages if not is_summary(m)] + [context]
+    HISTORY_MESSAGES.observe(len(llm_messages))
+    return session_messages, intent, llm_messages
+
+def cache_key_for(request: ChatRequest, session_messages: list, intent):
+    if is_cacheable(session_messages, intent):
+        return intent_key(intent, request.lang)
+    reply_cache.bypass()
+    return None
+
+def render_links(request: ChatRequest, intent, text: str):
+    """Build links for the areas in the model's text; returns (markdown block, links)."""
+    links = booking_links(text, intent, date.today(), request.lang)
+    return "\n".join(f"[{label}]({url})" for label, url in links), links
+
+def join_reply(*parts):
+    return "\n\n".join(p for p in parts if p)
+
+def deliver_reply(phone: str, reply: str, links: list):
+    if phone:  # If we received a phone number in the web chat
+        logger.debug("📲 Prompting user for phone number sharing on Telegram", extra={"phone": phone})
+        send_to_telegram_by_phone(phone, "Please tap the button below to share your phone number with the bot.", True)
+    send_to_telegram_by_phone(phone, reply)
+
+    # Send links to Telegram merged into as few messages as fit
+    if links:
+        for chunk in split_message("\n".join(f"{label}: {url}" for label, url in links)):
+            send_to_telegram_by_phone(phone, chunk)
+
+async def finish_turn(request: ChatRequest, endpoint: str, session_messages: list, reply: str, links: list):
+    with stage(endpoint, "session_save"):
+        session_messages.append({"role": "assistant", "content": reply})
+        await session_memory.asave(request.session_id, session_messages)
+    with stage(endpoint, "telegram_enqueue"):
+        deliver_reply(request.phone, reply, links)
 
-    requests.post(url, json=payload)
+def busy_response(request: ChatRequest):
+    return JSONResponse(status_code=503, headers={"Retry-After": "5"}, content={
+        "response": "⏳ We're handling a lot of requests right now. Please try again in a moment.",
+        "session_id": str(request.session_id)
+    })
 
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
-    today = datetime.today()
-    today_str = today.strftime("%B %d, %Y")
-    # If no session history, start new with system instructions
-    if request.session_id not in session_memory:
-        session_memory[request.session_id] = [
-            {
-                "role": "system",
-                "content": """
-
-                You are the Guest Communication Orchestrator Agent for a high-end short-term-rental company operating across Cairo, Egypt.   
-                Your mission: deliver a zero-hassle, exceptional guest experience through timely, warm, clear communication on every platform (Airbnb, WhatsApp Business, Instagram DM, phone, Telegram ops). 
-                You must react to both event- and time-based triggers (inquiries, bookings, check-ins, issues, post-checkout). 
-                You are a helpful vacation assistant who only answers questions related to hotel bookings or vacation stays.
-
-                If the user asks for vacation or hotel recommendations:
-
-                1. Greet them and acknowledge their destination and dates.
-                2. Recommend 2–3 popular areas in that city/country, with a short description for each.
-                3. Generate a clickable Markdown Airbnb link for each area using this format:
-                [Explore Zamalek](https://www.airbnb.com/s/Cairo--Zamalek/homes?checkin=2025-07-12&checkout=2025-07-15&adults=2&children=0&infants=0)
-
-                Your task:
-                - Extract:
-                - plz this is so importand part take it carfully
-                - **check-in and check-out** dates from the message, all the dates in the future — don't generate any past dates. 
-                - This is useful information you can use. Today is {today_str}. Always generate check-in/check-out dates in the current year: {today.year}.
-                - **adults**: anyone aged 13 and above (teens count as adults).
-                - **children**: aged 2–12.
-                - **infants**: under 2 years old.
-                - **Pets**: any thing realted to pest like dogs or cat etc.
-
-                - Include the full set of filters in every link: `checkin`, `checkout`, `adults`, `children`, `infants`, `pets`.
-                
-                If no guest count is provided:
-                - Assume: adults=2, children=0, infants=0
-
-                Airbnb Link Format:
-                https://www.airbnb.com/s/{City}--{Area}/homes?checkin=YYYY-MM-DD&checkout=YYYY-MM-DD&adults=X&children=Y&infants=Z
-
-                If user asks about anything non-travel related, respond:
-                "I'm sorry, I can only help with hotel bookings and vacation stays. Let me know where you're planning to travel."
-                """
-            }
-        ]
-
-    session_messages = session_memory[request.session_id]
-    session_messages.append({"role": "user", "content": request.message})
+    session_messages, intent, llm_messages = await start_turn(request, "chat")
+    cache_key = cache_key_for(request, session_messages, intent)
 
     try:
-        chat_completion = client.chat.completions.create(
-            model="gpt-4o",
-            messages=session_messages
-        )
-        reply = chat_completion.choices[0].message.content
-        if request.phone:  # If we received a phone number in the web chat
-            print(f"📲 Prompting user {request.phone} for phone number sharing on Telegram.")
-            send_to_telegram_by_phone(request.phone, "Please tap the button below to share your phone number with the bot.", True)
-        send_to_telegram_by_phone(request.phone, reply)
-
-        # Extract Markdown links like [Explore Zamalek](https://...)
-        markdown_links = re.findall(r'\[(.*?)\]\((https?://[^\s]+)\)', reply)
-
-        # Also fallback to raw links in case they exist without Markdown
-        raw_links = re.findall(r'(https?://www\.airbnb\.com/s/[^\s)]+)', reply)
-
-        # Combine unique links
-        all_links = set([text + ": " + url for text, url in markdown_links]) | set(raw_links)
-
-        # Send links to Telegram as individual messages
-        for link in all_links:
-            send_to_telegram_by_phone(request.phone, link)
-
-        session_messages.append({"role": "assistant", "content": reply})
+        with stage("chat", "cache"):
+            text = cache_key and reply_cache.get(cache_key)
+        shared = False
+        if not text:
+            with stage("chat", "llm"):
+                # Double-submits from the same session share one upstream call
+                chat_completion, shared = await llm.complete(
+                    llm_messages,
+                    model="gpt-4o",
+                    coalesce_key=request.session_id
+                )
+            text = chat_completion.choices[0].message.content
+            if not shared:
+                record_usage(chat_completion.usage)
+            if cache_key and not shared:
+                reply_cache.put(cache_key, text)
+
+        with stage("chat", "links"):
+            links_text, links = render_links(request, intent, text)
+            reply = join_reply(intent.summary_line(request.lang), text, links_text)
+        if not shared:
+            await finish_turn(request, "chat", session_messages, reply, links)
 
         return {
             "response": reply,
             "session_id": str(request.session_id)
         }
 
+    except GatewaySaturated:
+        return busy_response(request)
+
     except Exception as e:
+        logger.exception("❌ Chat request failed", extra={"session_id": str(request.session_id)})
+        await session_memory.asave(request.session_id, session_messages)
         return {
             "response": "❌ An error occurred while processing your request.",
             "error": str(e),
             "session_id": str(request.session_id)
         }
-    
-@app.post("/telegram-webhook")
-async def telegram_webhook(req: Request):
-    data = await req.json()
-    print("📥 Telegram webhook triggered!")
-    print("📦 Incoming data:", json.dumps(data, indent=2))
-
-    message = data.get("message", {})
-
-    # Handle /start command
-    if "text" in message and message["text"] == "/start":
-        chat_id = message["chat"]["id"]
-
-        print(f"🚀 /start command received from chat_id: {chat_id}")
-
-        welcome_msg = (
-            "👋 Welcome to the Vacation Assistant!\n\n"
-            "Please tap the button below to share your phone number. Once you do, "
-            "you’ll receive vacation suggestions via this chat whenever you search on our website."
-        )
-
-        keyboard = {
-            "keyboard": [[{
-                "text": "📱 Share Phone Number",
-                "request_contact": True
-            }]],
-            "resize_keyboard": True,
-            "one_time_keyboard": True
-        }
 
-        resp = requests.post(
-            f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage",
-            json={
-                "chat_id": chat_id,
-                "text": welcome_msg,
-                "reply_markup": keyboard
-            }
-        )
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
-        print("📤 Sent /start reply:", resp.status_code, resp.text)
-        return {"status": "start_sent"}
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    # Reject before the 200 and event-stream headers go out
+    if llm.saturated():
+        return busy_response(request)
 
-    # Handle contact sharing
-    if "contact" in message:
-        phone = message["contact"]["phone_number"].lstrip("+")
-        chat_id = message["chat"]["id"]
+    session_messages, intent, llm_messages = await start_turn(request, "chat_stream")
+    cache_key = cache_key_for(request, session_messages, intent)
 
-        print(f"📲 Contact shared: phone={phone}, chat_id={chat_id}")
+    async def event_stream():
+        header = intent.summary_line(request.lang)
+        if header:
+            yield sse_event("token", {"content": header + "\n\n"})
 
+        with stage("chat_stream", "cache"):
+            text = cache_key and reply_cache.get(cache_key)
+        parts = [text] if text else []
+        try:
+            if text:
+                yield sse_event("token", {"content": text})
+            else:
+                # Stage time covers the whole stream, including time spent
+                # waiting on the client to read each event
+                with stage("chat_stream", "llm"):
+                    # The gateway closes the upstream stream on completion and when
+                    # the client disconnects mid-stream, so it is never leaked
+                    async with llm.stream(llm_messages, model="gpt-4o") as stream:
+                        async for chunk in stream:
+                            record_usage(chunk.usage)
+                            delta = chunk.choices[0].delta.content if chunk.choices else None
+                            if delta:
+                                parts.append(delta)
+                                yield sse_event("token", {"content": delta})
+                text = "".join(parts)
+                if cache_key:
+                    reply_cache.put(cache_key, text)
+
+            with stage("chat_stream", "links"):
+                links_text, links = render_links(request, intent, text)
+            if links_text:
+                yield sse_event("token", {"content": "\n\n" + links_text})
+            reply = join_reply(header, text, links_text)
+            await finish_turn(request, "chat_stream", session_messages, reply, links)
+            yield sse_event("done", {"response": reply, "session_id": str(request.session_id)})
+
+        except GatewaySaturated:
+            await session_memory.asave(request.session_id, session_messages)
+            yield sse_event("error", {
+                "response": "⏳ We're handling a lot of requests right now. Please try again in a moment.",
+                "session_id": str(request.session_id)
+            })
+
+        except Exception as e:
+            logger.exception("❌ Chat stream failed", extra={"session_id": str(request.session_id)})
+            await session_memory.asave(request.session_id, session_messages)
+            yield sse_event("error", {
+                "response": "❌ An error occurred while processing your request.",
+                "error": str(e),
+                "session_id": str(request.session_id)
+            })
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def handle_start(messages: list):
+    # One welcome per chat, even if /start was tapped several times in a burst
+    chat_ids = list(dict.fromkeys(message["chat"]["id"] for message in messages))
+    logger.info("🚀 /start command received", extra={"chat_ids": chat_ids})
+
+    welcome_msg = (
+        "👋 Welcome to the Vacation Assistant!\n\n"
+        "Please tap the button below to share your phone number. Once you do, "
+        "you’ll receive vacation suggestions via this chat whenever you search on our website."
+    )
+
+    with stage("telegram_updates", "telegram_enqueue"):
+        for chat_id in chat_ids:
+            telegram.enqueue({
+                "chat_id": chat_id,
+                "text": welcome_msg,
+                "reply_markup": SHARE_PHONE_KEYBOARD
+            })
+
+async def handle_contacts(messages: list):
+    # Last contact per chat wins; all links are written in one transaction
+    links = {}
+    for message in messages:
+        # Check each message before the batch write, so one bad contact can't fail the others
         try:
-            with open("chat_id_store.json", "r") as f:
-                mapping = json.load(f)
-        except FileNotFoundError:
-            mapping = {}
+            chat_id = int(message["chat"]["id"])
+            phone = normalize_phone(message["contact"]["phone_number"])
+        except (KeyError, TypeError, ValueError):
+            phone = None
+        if not phone:
+            logger.warning("⚠️ Skipping malformed contact", extra={"chat_id": message.get("chat", {}).get("id")})
+            continue
+        links[chat_id] = phone
+    if not links:
+        return
+    logger.info("📲 Contacts shared", extra={"count": len(links)})
 
-        mapping[phone] = chat_id
+    with stage("telegram_updates", "store_write"):
+        await asyncio.to_thread(phone_store.link_many, [(phone, chat_id) for chat_id, phone in links.items()])
 
-        with open("chat_id_store.json", "w") as f:
-            json.dump(mapping, f)
+    logger.info("✅ Saved phone links", extra={"links": {phone: chat_id for chat_id, phone in links.items()}})
 
-        print(f"✅ Saved phone {phone} → chat_id {chat_id}")
+    with stage("telegram_updates", "telegram_enqueue"):
+        for chat_id in links:
+            telegram.enqueue({
+                "chat_id": chat_id,
+                "text": "✅ You’re now linked! You’ll receive hotel links here when you use the assistant on the website.",
+            })
 
-        requests.post(f"https://api.telegram.org/bot{TELEGRAM_BOT_TOKEN}/sendMessage", json={
-            "chat_id": chat_id,
-            "text": "✅ You’re now linked! You’ll receive hotel links here when you use the assistant on the website.",
-        })
+# 🗂️ Update kind -> handler; add entries here to support more update types
+UPDATE_HANDLERS = {
+    "/start": handle_start,
+    "contact": handle_contacts,
+}
 
-        return {"status": "linked"}
+# 📥 Webhook updates are acknowledged at once and handled by background workers
+telegram_updates = UpdateProcessor(UPDATE_HANDLERS)
 
-    print("🤷 Message did not match any handled type")
-    return {"status": "ignored"}
+@app.post("/telegram-webhook")
+async def telegram_webhook(req: Request):
+    secret = req.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if TELEGRAM_WEBHOOK_SECRET and not hmac.compare_digest(secret, TELEGRAM_WEBHOOK_SECRET):
+        return JSONResponse(status_code=401, content={"status": "unauthorized"})
+
+    with stage("telegram_webhook", "parse"):
+        data = await req.json()
+    # Only pay for serializing the payload when debug logging is on
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("📦 Incoming data", extra={"payload": data})
+
+    status = telegram_updates.submit(data)
+    if status == "dropped":
+        # A non-2xx makes Telegram deliver this update again later
+        return JSONResponse(status_code=503, content={"status": status})
+    return {"status": status}
+
+@registry.collector
+def collect_live_state():
+    SESSIONS.set(len(session_memory))
+    PHONE_LINKS.set(len(phone_store))
+    TELEGRAM_QUEUE_DEPTH.set(telegram.depth())
+    for result, count in telegram.stats.items():
+        TELEGRAM_MESSAGES.set(count, result=result)
+    for status, count in telegram.status_codes.items():
+        TELEGRAM_RESPONSES.set(count, status=status)
+    for event, count in llm.stats.items():
+        LLM_EVENTS.set(count, event=event)
+    LLM_SLOTS.set(llm.in_flight, state="running")
+    LLM_SLOTS.set(llm.waiting, state="waiting")
+    for event, count in reply_cache.stats.items():
+        REPLY_CACHE_EVENTS.set(count, event=event)
+    TELEGRAM_UPDATE_QUEUE_DEPTH.set(telegram_updates.depth())
+    for result, count in telegram_updates.stats.items():
+        TELEGRAM_UPDATES.set(count, result=result)
+
+@app.get("/metrics")
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/check-phone")
 async def check_phone(request: Request):
     body = await request.json()
-    phone = body.get("phone", "").lstrip("+")
-    chat_id = get_chat_id_by_phone(phone)
+    phone = body.get("phone", "")
+    with stage("check_phone", "store_read"):
+        chat_id = get_chat_id_by_phone(phone)
     return {"linked": bool(chat_id)}
 
 if __name__ == "__main__":
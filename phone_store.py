@@ -0,0 +1,141 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COUNTRY_CODE = os.getenv("DEFAULT_COUNTRY_CODE", "")
+REFRESH_INTERVAL = float(os.getenv("PHONE_STORE_REFRESH_INTERVAL", 1.0))
+
+
+def normalize_phone(phone: str) -> str:
+    """Normalize a phone number to its E.164 digits (no leading +).
+
+    "+20 100-123-4567", "0020 1001234567" and "201001234567" all map to
+    "201001234567". A national number with a single leading 0 is only
+    expanded when DEFAULT_COUNTRY_CODE is configured.
+    """
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("00"):
+        digits = digits[2:]
+    elif digits.startswith("0") and DEFAULT_COUNTRY_CODE and not phone.strip().startswith("+"):
+        digits = DEFAULT_COUNTRY_CODE + digits[1:]
+    return digits
+
+
+class PhoneStore:
+    """Phone → Telegram chat_id mapping held in memory and persisted to SQLite.
+
+    Lookups are served from a dict. Writes go through a single upsert in WAL
+    mode, so several uvicorn workers can share one database file. Each row
+    carries a sequence number; a worker notices other workers' writes via
+    ``PRAGMA data_version`` and pulls only the rows newer than what it has.
+
+    Writes use their own connection and lock, so a writer waiting on another
+    worker's transaction never holds up lookups on the event loop.
+    """
+
+    def __init__(self, path: str = "chat_id_store.db", legacy_json: str = "chat_id_store.json"):
+        self.path = path
+        self.lock = threading.Lock()  # guards index, seq and the read connection
+        self.write_lock = threading.Lock()
+        self.index = {}
+        self.seq = 0
+        self.data_version = None
+        self.checked_at = 0.0
+
+        self.write_conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self.write_conn.execute("PRAGMA journal_mode=WAL")
+        self.write_conn.execute("PRAGMA synchronous=NORMAL")
+        self.write_conn.execute(
+            "CREATE TABLE IF NOT EXISTS links ("
+            "phone TEXT PRIMARY KEY, chat_id INTEGER NOT NULL, seq INTEGER NOT NULL)"
+        )
+        self.write_conn.execute("CREATE INDEX IF NOT EXISTS links_seq ON links(seq)")
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self._import_legacy_json(legacy_json)
+        with self.lock:
+            self._refresh()
+
+    def _import_legacy_json(self, legacy_json: str):
+        # One-time migration from the old whole-file JSON store
+        if not legacy_json or not os.path.exists(legacy_json):
+            return
+        if self.conn.execute("SELECT 1 FROM links LIMIT 1").fetchone():
+            return
+        try:
+            with open(legacy_json, "r") as f:
+                mapping = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning("⚠️ Could not import legacy phone links", extra={"path": legacy_json, "error": str(e)})
+            return
+        self.link_many(mapping.items())
+        logger.info("📦 Imported legacy phone links", extra={"path": legacy_json, "count": len(mapping)})
+
+    def _refresh(self):
+        """Pull rows written since our last refresh. Caller holds the lock."""
+        version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        self.checked_at = time.monotonic()
+        if version == self.data_version:
+            return
+        self.data_version = version
+        rows = self.conn.execute(
+            "SELECT phone, chat_id, seq FROM links WHERE seq > ? ORDER BY seq", (self.seq,)
+        ).fetchall()
+        for phone, chat_id, seq in rows:
+            self.index[phone] = chat_id
+            self.seq = seq
+
+    def get(self, phone: str):
+        key = normalize_phone(phone)
+        if not key:
+            return None
+        with self.lock:
+            chat_id = self.index.get(key)
+            # Misses and stale entries may have been written by another worker
+            if chat_id is None or time.monotonic() - self.checked_at > REFRESH_INTERVAL:
+                self._refresh()
+                chat_id = self.index.get(key)
+        return chat_id
+
+    def link(self, phone: str, chat_id: int):
+        self.link_many([(phone, chat_id)])
+
+    def link_many(self, pairs):
+        """Upsert several phone → chat_id links in one transaction."""
+        pairs = [(normalize_phone(p), int(c)) for p, c in pairs]
+        pairs = [(p, c) for p, c in pairs if p]
+        if not pairs:
+            return
+        # May wait up to the busy timeout for another worker's write; lookups carry on meanwhile
+        with self.write_lock:
+            self.write_conn.execute("BEGIN IMMEDIATE")
+            try:
+                (seq,) = self.write_conn.execute("SELECT COALESCE(MAX(seq), 0) FROM links").fetchone()
+                for phone, chat_id in pairs:
+                    seq += 1
+                    self.write_conn.execute(
+                        "INSERT INTO links (phone, chat_id, seq) VALUES (?, ?, ?) "
+                        "ON CONFLICT(phone) DO UPDATE SET chat_id = excluded.chat_id, seq = excluded.seq",
+                        (phone, chat_id, seq),
+                    )
+                self.write_conn.execute("COMMIT")
+            except Exception:
+                self.write_conn.execute("ROLLBACK")
+                raise
+        # The write connection is "another connection" to the reader, so data_version moves
+        with self.lock:
+            self._refresh()
+
+    def __len__(self):
+        return len(self.index)
+
+    def close(self):
+        with self.write_lock:
+            self.write_conn.close()
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from booking_intent import is_catalogued
+
+REPLY_CACHE_SIZE = int(os.getenv("REPLY_CACHE_SIZE", 2000))
+REPLY_CACHE_TTL = float(os.getenv("REPLY_CACHE_TTL_SECONDS", 24 * 60 * 60))
+REPLY_CACHE_PATH = os.getenv("REPLY_CACHE_PATH", "")  # empty: memory only
+
+
+def stay_bucket(intent) -> str:
+    if not (intent.checkin and intent.checkout):
+        return "any"
+    nights = (intent.checkout - intent.checkin).days
+    if nights <= 2:
+        return "short"
+    if nights <= 6:
+        return "mid"
+    return "long"
+
+
+def intent_key(intent, lang: str) -> str:
+    """Cache key for a booking intent; dates and guest counts are rendered per request."""
+    areas = ",".join(sorted(a.name for a in intent.areas)) or "-"
+    return "|".join((intent.city or "-", areas, lang or "en", stay_bucket(intent)))
+
+
+def is_cacheable(session_messages: list, intent) -> bool:
+    # Follow-up turns depend on the conversation so far, not just the intent
+    turns = [m for m in session_messages if m["role"] != "system"]
+    if not intent.found or len(turns) != 1:
+        return False
+    # On a first turn the city only comes from a city or area the guest named. Replies
+    # about anywhere else, or with no place at all ("my wife and I"), are answered fresh.
+    return is_catalogued(intent.city)
+
+
+class ReplyCache:
+    """LRU + TTL cache of model-written area descriptions, optionally backed by SQLite.
+
+    The memory tier is checked first; on a miss the disk tier (when
+    configured) is consulted and a hit is promoted back into memory, so the
+    cache is warm again after a restart.
+    """
+
+    def __init__(self, max_size: int = REPLY_CACHE_SIZE, ttl: float = REPLY_CACHE_TTL,
+                 path: str = REPLY_CACHE_PATH):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()  # key -> (expires_at wall clock, text)
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "bypassed": 0, "evictions": 0}
+        self.conn = None
+        if path:
+            self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS replies (key TEXT PRIMARY KEY, text TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS replies_expires ON replies(expires_at)")
+
+    def get(self, key: str):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[0] >= now:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return entry[1]
+            if entry:
+                del self.entries[key]
+
+            if self.conn is not None:
+                row = self.conn.execute(
+                    "SELECT text, expires_at FROM replies WHERE key = ? AND expires_at >= ?", (key, now)
+                ).fetchone()
+                if row:
+                    self._remember(key, row[0], row[1])
+                    self.stats["disk_hits"] += 1
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key: str, text: str):
+        expires_at = time.time() + self.ttl
+        with self.lock:
+            self._remember(key, text, expires_at)
+            if self.conn is not None:
+                self.conn.execute(
+                    "INSERT INTO replies (key, text, expires_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET text = excluded.text, expires_at = excluded.expires_at",
+                    (key, text, expires_at),
+                )
+                self.conn.execute("DELETE FROM replies WHERE expires_at < ?", (time.time(),))
+
+    def bypass(self):
+        self.stats["bypassed"] += 1
+
+    def _remember(self, key, text, expires_at):
+        self.entries[key] = (expires_at, text)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def __len__(self):
+        return len(self.entries)
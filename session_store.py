@@ -0,0 +1,227 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+SESSION_TTL = float(os.getenv("SESSION_TTL_SECONDS", 6 * 60 * 60))
+SESSION_MAX_COUNT = int(os.getenv("SESSION_MAX_COUNT", 10000))
+SESSION_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", 64 * 1024 * 1024))
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", 3000))
+
+
+class SessionStore(ABC):
+    """Interface for chat history storage, keyed by session id."""
+
+    @abstractmethod
+    def get(self, session_id):
+        ...
+
+    @abstractmethod
+    def save(self, session_id, messages: list):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id):
+        ...
+
+    def __contains__(self, session_id):
+        return self.get(session_id) is not None
+
+    @abstractmethod
+    def __len__(self):
+        ...
+
+    # Called from request handlers; backends that can block override these to run off the event loop
+    async def aget(self, session_id):
+        return self.get(session_id)
+
+    async def asave(self, session_id, messages: list):
+        self.save(session_id, messages)
+
+
+def _message_bytes(messages: list) -> int:
+    return sum(len(m.get("content") or "") + 32 for m in messages)
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store with idle TTL and LRU eviction by count and approximate size."""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_sessions: int = SESSION_MAX_COUNT,
+                 max_bytes: int = SESSION_MAX_BYTES):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.sessions = OrderedDict()  # session_id -> (expires_at, size, messages)
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, session_id):
+        key = str(session_id)
+        with self.lock:
+            entry = self.sessions.get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                self._pop(key)
+                return None
+            self.sessions.move_to_end(key)
+            return list(entry[2])
+
+    def save(self, session_id, messages: list):
+        key = str(session_id)
+        size = _message_bytes(messages)
+        with self.lock:
+            if key in self.sessions:
+                self._pop(key)
+            self.sessions[key] = (time.monotonic() + self.ttl, size, list(messages))
+            self.total_bytes += size
+            self._evict()
+
+    def delete(self, session_id):
+        with self.lock:
+            if str(session_id) in self.sessions:
+                self._pop(str(session_id))
+
+    def _pop(self, key):
+        _, size, _ = self.sessions.pop(key)
+        self.total_bytes -= size
+
+    def _evict(self):
+        now = time.monotonic()
+        # Oldest-used first; expired entries cluster at the front too
+        while self.sessions:
+            key, (expires_at, _, _) = next(iter(self.sessions.items()))
+            over = len(self.sessions) > self.max_sessions or self.total_bytes > self.max_bytes
+            if not over and expires_at >= now:
+                break
+            self._pop(key)
+
+    def __len__(self):
+        return len(self.sessions)
+
+
+class SQLiteSessionStore(SessionStore):
+    """Shared store so several uvicorn workers can serve the same session.
+
+    Another worker's write can hold the database for up to the busy timeout,
+    so the async accessors run queries on a thread instead of the event loop.
+    """
+
+    def __init__(self, path: str = "sessions.db", ttl: float = SESSION_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.last_purge = 0.0
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=10, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "id TEXT PRIMARY KEY, messages TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS sessions_expires ON sessions(expires_at)")
+
+    async def aget(self, session_id):
+        return await asyncio.to_thread(self.get, session_id)
+
+    async def asave(self, session_id, messages: list):
+        await asyncio.to_thread(self.save, session_id, messages)
+
+    def get(self, session_id):
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT messages FROM sessions WHERE id = ? AND expires_at >= ?",
+                (str(session_id), time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def save(self, session_id, messages: list):
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO sessions (id, messages, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET messages = excluded.messages, expires_at = excluded.expires_at",
+                (str(session_id), json.dumps(messages), now + self.ttl),
+            )
+            if now - self.last_purge > 60:
+                self.conn.execute("DELETE FROM sessions WHERE expires_at < ?", (now,))
+                self.last_purge = now
+
+    def delete(self, session_id):
+        with self.lock:
+            self.conn.execute("DELETE FROM sessions WHERE id = ?", (str(session_id),))
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM sessions WHERE expires_at >= ?", (time.time(),)
+            ).fetchone()[0]
+
+
+def make_session_store() -> SessionStore:
+    """Pick the backend from SESSION_STORE (memory | sqlite)."""
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_STORE_PATH", "sessions.db"))
+    return MemorySessionStore()
+
+
+# --- History windowing ---
+
+SUMMARY_PREFIX = "Booking facts from earlier in this conversation:"
+FACT_KEYS = ("city", "areas", "checkin", "checkout", "adults", "children", "infants", "pets")
+
+
+def estimate_tokens(message: dict) -> int:
+    # ~4 characters per token plus per-message overhead; close enough for budgeting
+    return len(message.get("content") or "") // 4 + 4
+
+
+def is_summary(message: dict) -> bool:
+    """Whether a message is the facts summary that window_history keeps with the session."""
+    return message["role"] == "system" and (message.get("content") or "").startswith(SUMMARY_PREFIX)
+
+
+def session_facts(messages: list) -> dict:
+    """Booking facts saved with the session by the last turn (see window_history)."""
+    facts = {}
+    for message in messages:
+        if is_summary(message):
+            for part in message["content"][len(SUMMARY_PREFIX):].split(";"):
+                key, _, value = part.partition(":")
+                if key.strip() in FACT_KEYS and value.strip():
+                    facts[key.strip()] = value.strip()
+    return facts
+
+
+def summary_message(facts: dict) -> dict:
+    parts = [f"{key}: {facts[key]}" for key in FACT_KEYS if facts.get(key)]
+    return {"role": "system", "content": f"{SUMMARY_PREFIX} " + "; ".join(parts)}
+
+
+def window_history(messages: list, facts: dict = None, token_budget: int = HISTORY_TOKEN_BUDGET) -> list:
+    """Trim history to the system prompt, a facts summary and the most recent turns that fit the budget.
+
+    ``facts`` are the booking details resolved for this turn (BookingIntent.facts());
+    they replace any earlier summary, so the next turn keeps the city, dates and
+    guest counts once the turns that stated them fall out of the window. The
+    summary is stored, not sent to the model, so it doesn't count against the budget.
+    """
+    head = messages[:1] if messages and messages[0]["role"] == "system" else []
+    rest = [m for m in messages[len(head):] if not is_summary(m)]
+    summary = [summary_message(facts)] if facts else []
+
+    used = sum(estimate_tokens(m) for m in head)
+    keep = 0
+    for message in reversed(rest):
+        cost = estimate_tokens(message)
+        # Always keep the newest message, even when it alone is over budget
+        if keep and used + cost > token_budget:
+            break
+        used += cost
+        keep += 1
+
+    return head + summary + rest[len(rest) - keep:]
@@ -0,0 +1,232 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from collections import Counter, deque
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Telegram Bot API limits: ~30 messages/second overall, ~1 message/second per chat
+# https://core.telegram.org/bots/faq#my-bot-is-hitting-limits-how-do-i-avoid-this
+GLOBAL_RATE = float(os.getenv("TELEGRAM_GLOBAL_RATE", 30))
+PER_CHAT_INTERVAL = float(os.getenv("TELEGRAM_PER_CHAT_INTERVAL", 1.0))
+QUEUE_SIZE = int(os.getenv("TELEGRAM_QUEUE_SIZE", 1000))
+WORKERS = int(os.getenv("TELEGRAM_WORKERS", 4))
+MAX_RETRIES = int(os.getenv("TELEGRAM_MAX_RETRIES", 4))
+
+MAX_MESSAGE_LENGTH = 4096
+
+
+def split_message(text: str, limit: int = MAX_MESSAGE_LENGTH):
+    """Split text into Telegram-sized chunks, breaking on newlines where possible."""
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text:
+        chunks.append(text)
+    return chunks
+
+
+class TokenBucket:
+    """Shared token bucket used for the global send rate."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class TelegramDelivery:
+    """Background sender for sendMessage payloads over a pooled async client.
+
+    Each chat keeps its own FIFO of pending payloads, and chats with
+    something to send wait in a heap ordered by the time they are next
+    allowed to send (last send + per-chat interval, or a retry delay). Workers
+    always take the earliest due chat, so a chat that has to wait never holds
+    up the others. A chat is out of the heap while one of its payloads is in
+    flight, which keeps messages to one chat in order. ``enqueue`` never
+    blocks: when the queue is full the payload is dropped and counted.
+    """
+
+    def __init__(self, token: str, base_url: str = "https://api.telegram.org",
+                 workers: int = WORKERS, queue_size: int = QUEUE_SIZE,
+                 global_rate: float = GLOBAL_RATE, per_chat_interval: float = PER_CHAT_INTERVAL,
+                 max_retries: int = MAX_RETRIES):
+        self.url = f"{base_url}/bot{token}/sendMessage"
+        self.workers = max(1, workers)
+        self.queue_size = max(1, queue_size)
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(global_rate)
+        self.client = None
+        self.tasks = []
+        self.pending = {}  # chat_id -> deque of (payload, attempt); present while queued or in flight
+        self.due = []  # heap of (due_at, seq, chat_id) for chats waiting to send
+        self.seq = itertools.count()
+        self.size = 0
+        self.wakeup = None
+        self.drained = None
+        self.last_sent = {}
+        self.stats = {"enqueued": 0, "sent": 0, "failed": 0, "retried": 0, "dropped": 0}
+        self.status_codes = Counter()  # HTTP status of every sendMessage attempt ("error" for transport failures)
+
+    async def start(self):
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(10.0, connect=5.0),
+            limits=httpx.Limits(max_connections=self.workers * 2, max_keepalive_connections=self.workers),
+        )
+        self.wakeup = asyncio.Event()
+        self.drained = asyncio.Event()
+        self.drained.set()
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 5.0):
+        # Give queued messages a chance to go out before shutting down
+        if self.drained is not None:
+            try:
+                await asyncio.wait_for(self.drained.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning("⚠️ Telegram queue not drained on shutdown", extra={"pending": self.depth()})
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    def depth(self):
+        return self.size
+
+    def enqueue(self, payload: dict) -> bool:
+        if not self.tasks:
+            logger.error("❌ Telegram delivery not started, dropping message")
+            self.stats["dropped"] += 1
+            return False
+        chat_id = payload["chat_id"]
+        if self.size >= self.queue_size:
+            self.stats["dropped"] += 1
+            logger.warning("❌ Telegram queue full, dropping message", extra={"chat_id": chat_id})
+            return False
+        queue = self.pending.get(chat_id)
+        if queue is None:
+            queue = self.pending[chat_id] = deque()
+            self._schedule(chat_id)
+        # Otherwise the chat is already scheduled or in flight and will be rescheduled when done
+        queue.append((payload, 0))
+        self.size += 1
+        self.drained.clear()
+        self.stats["enqueued"] += 1
+        return True
+
+    def _schedule(self, chat_id, delay: float = 0.0):
+        due_at = time.monotonic() + delay
+        last = self.last_sent.get(chat_id)
+        if last is not None:
+            due_at = max(due_at, last + self.per_chat_interval)
+        heapq.heappush(self.due, (due_at, next(self.seq), chat_id))
+        self.wakeup.set()
+
+    async def _next_chat(self):
+        """Wait for the earliest due chat and take it out of the heap."""
+        while True:
+            timeout = None
+            if self.due:
+                timeout = self.due[0][0] - time.monotonic()
+                if timeout <= 0:
+                    return heapq.heappop(self.due)[2]
+            # Woken early by _schedule when a chat is added that may be due sooner
+            self.wakeup.clear()
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._next_chat()
+            queue = self.pending[chat_id]
+            payload, attempt = queue.popleft()
+            try:
+                retry = await self._deliver(payload, attempt)
+            except Exception:
+                retry = None
+                self.stats["failed"] += 1
+                logger.exception("❌ Telegram send crashed", extra={"chat_id": chat_id})
+            if retry is not None:
+                # Retry before anything queued behind it, so the chat stays in order
+                payload, delay = retry
+                queue.appendleft((payload, attempt + 1))
+                self._schedule(chat_id, delay)
+                continue
+            self.size -= 1
+            if queue:
+                self._schedule(chat_id)
+            else:
+                del self.pending[chat_id]
+                if not self.size:
+                    self.drained.set()
+
+    def _mark_sent(self, chat_id):
+        now = time.monotonic()
+        self.last_sent[chat_id] = now
+        # Forget chats that are past their interval so the map stays small
+        if len(self.last_sent) > 10000:
+            cutoff = now - self.per_chat_interval
+            self.last_sent = {k: v for k, v in self.last_sent.items() if v > cutoff}
+
+    async def _deliver(self, payload: dict, attempt: int):
+        """Make one send attempt; returns ``(payload, delay)`` to retry, or None when done."""
+        chat_id = payload["chat_id"]
+        await self.bucket.acquire()
+        try:
+            resp = await self.client.post(self.url, json=payload)
+        except httpx.HTTPError as e:
+            self.status_codes["error"] += 1
+            status, retry_after, error = None, None, str(e)
+        else:
+            self.status_codes[resp.status_code] += 1
+            self._mark_sent(chat_id)
+            if resp.status_code == 200:
+                self.stats["sent"] += 1
+                return None
+            status, error = resp.status_code, resp.text
+            try:
+                retry_after = resp.json().get("parameters", {}).get("retry_after")
+            except ValueError:
+                retry_after = None
+
+        if attempt < self.max_retries:
+            # Markdown the model produced may not parse; resend as plain text once
+            if status == 400 and "parse_mode" in payload and "parse entities" in error:
+                return {k: v for k, v in payload.items() if k != "parse_mode"}, 0.0
+            if status is None or status == 429 or status >= 500:
+                self.stats["retried"] += 1
+                delay = retry_after if retry_after else min(30, 0.5 * 2 ** attempt) * (0.5 + random.random())
+                return payload, delay
+
+        self.stats["failed"] += 1
+        logger.warning("❌ Telegram send failed", extra={"chat_id": chat_id, "status": status, "error": error})
+        return None
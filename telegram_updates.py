@@ -0,0 +1,190 @@
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+WORKERS = int(os.getenv("TELEGRAM_UPDATE_WORKERS", 4))
+QUEUE_SIZE = int(os.getenv("TELEGRAM_UPDATE_QUEUE_SIZE", 2000))
+SEEN_SIZE = int(os.getenv("TELEGRAM_UPDATE_SEEN_SIZE", 10000))
+BATCH_SIZE = int(os.getenv("TELEGRAM_UPDATE_BATCH_SIZE", 50))
+BATCH_WAIT = float(os.getenv("TELEGRAM_UPDATE_BATCH_WAIT", 0.02))
+
+
+def update_kind(update: dict):
+    """Return (kind, message) for an update.
+
+    Commands are keyed by the command itself ("/start"); other messages by
+    the first content field present ("contact", "text", ...).
+    """
+    message = update.get("message")
+    if not isinstance(message, dict):
+        return None, {}
+    text = message.get("text") or ""
+    if text.startswith("/"):
+        # "/start@MyBot payload" -> "/start"
+        return text.split()[0].split("@")[0], message
+    for field in ("contact", "location", "photo", "document", "text"):
+        if field in message:
+            return field, message
+    return None, message
+
+
+class UpdateProcessor:
+    """Acknowledge-first processing of webhook updates.
+
+    ``submit`` drops update_ids it has already accepted (Telegram re-delivers
+    on slow or failed webhooks), then queues the update and returns at once.
+    Workers pull updates in small batches and hand each handler the messages
+    of its kind from the batch, so bursts share disk writes and reply sends.
+    Updates are sharded by chat id, and a message only joins an earlier group
+    of its kind when its chat has nothing queued after that group, so one
+    chat's updates stay in order.
+
+    If a handler fails on a batch, its messages are retried one at a time so
+    one bad message doesn't take the rest with it. Updates that still fail are
+    forgotten, so a re-delivery from Telegram is accepted rather than dropped
+    as a duplicate.
+
+    The seen-set is per process; with several uvicorn workers a re-delivered
+    update can still land on a different worker.
+    """
+
+    def __init__(self, handlers: dict, workers: int = WORKERS, queue_size: int = QUEUE_SIZE,
+                 seen_size: int = SEEN_SIZE, batch_size: int = BATCH_SIZE, batch_wait: float = BATCH_WAIT):
+        self.handlers = handlers  # kind -> async handler(list of messages)
+        self.workers = max(1, workers)
+        self.shard_size = max(1, queue_size // self.workers)
+        self.seen_size = seen_size
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.seen = OrderedDict()
+        self.queues = []
+        self.tasks = []
+        self.stats = {"queued": 0, "duplicate": 0, "ignored": 0, "dropped": 0, "handled": 0, "failed": 0}
+
+    async def start(self):
+        self.queues = [asyncio.Queue(maxsize=self.shard_size) for _ in range(self.workers)]
+        self.tasks = [asyncio.create_task(self._worker(q)) for q in self.queues]
+
+    async def stop(self, timeout: float = 5.0):
+        try:
+            await asyncio.wait_for(asyncio.gather(*(q.join() for q in self.queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("⚠️ Telegram updates not drained on shutdown", extra={"pending": self.depth()})
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def depth(self):
+        return sum(q.qsize() for q in self.queues)
+
+    def _forget(self, update_id):
+        self.seen.pop(update_id, None)
+
+    def _remember(self, update_id):
+        if update_id is None:
+            return
+        self.seen[update_id] = None
+        if len(self.seen) > self.seen_size:
+            self.seen.popitem(last=False)
+
+    def submit(self, update: dict) -> str:
+        """Queue an update; returns queued, duplicate, ignored or dropped."""
+        update_id = update.get("update_id")
+        if update_id is not None and update_id in self.seen:
+            self.stats["duplicate"] += 1
+            return "duplicate"
+
+        kind, message = update_kind(update)
+        if kind not in self.handlers:
+            self._remember(update_id)
+            self.stats["ignored"] += 1
+            return "ignored"
+
+        chat_id = (message.get("chat") or {}).get("id")
+        if chat_id is None:
+            self._remember(update_id)
+            self.stats["ignored"] += 1
+            return "ignored"
+        queue = self.queues[hash(chat_id) % self.workers] if self.queues else None
+        try:
+            if queue is None:
+                raise asyncio.QueueFull
+            queue.put_nowait((update_id, kind, message))
+        except asyncio.QueueFull:
+            # Not remembered, so Telegram's retry of this update is accepted later
+            self.stats["dropped"] += 1
+            logger.warning("❌ Telegram update queue full, dropping update", extra={"update_id": update_id})
+            return "dropped"
+
+        self._remember(update_id)
+        self.stats["queued"] += 1
+        return "queued"
+
+    async def _next_batch(self, queue: asyncio.Queue):
+        batch = [await queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    @staticmethod
+    def _group(batch):
+        """Split a batch into (kind, items) groups to run in order, keeping each chat's updates in order."""
+        groups = []
+        of_kind = {}  # kind -> indexes of its groups
+        last_of_chat = {}  # chat id -> index of the group holding its latest update
+        for item in batch:
+            kind, chat_id = item[1], item[2]["chat"]["id"]
+            # The earliest group of this kind that runs no sooner than the chat's previous update
+            after = last_of_chat.get(chat_id, -1)
+            index = next((i for i in of_kind.get(kind, ()) if i >= after), None)
+            if index is None:
+                index = len(groups)
+                of_kind.setdefault(kind, []).append(index)
+                groups.append((kind, []))
+            groups[index][1].append(item)
+            last_of_chat[chat_id] = index
+        return groups
+
+    async def _handle(self, kind, items):
+        try:
+            await self.handlers[kind]([message for _, _, message in items])
+        except Exception:
+            if len(items) == 1:
+                update_id = items[0][0]
+                self.stats["failed"] += 1
+                self._forget(update_id)
+                logger.exception("❌ Telegram update handler failed", extra={"kind": kind, "update_id": update_id})
+                return
+            logger.warning("⚠️ Telegram update batch failed, retrying one by one",
+                           extra={"kind": kind, "count": len(items)}, exc_info=True)
+        else:
+            self.stats["handled"] += len(items)
+            return
+        # Outside the except block, so each retry's failure is logged on its own
+        for item in items:
+            await self._handle(kind, [item])
+
+    async def _worker(self, queue: asyncio.Queue):
+        while True:
+            batch = await self._next_batch(queue)
+            for kind, items in self._group(batch):
+                await self._handle(kind, items)
+            for _ in batch:
+                queue.task_done()
@@ -0,0 +1,104 @@
+from datetime import date
+
+import pytest
+
+from booking_intent import booking_links, extract_intent, parse_dates, parse_guests
+
+TODAY = date(2026, 10, 18)  # a Sunday
+
+
+@pytest.mark.parametrize("text, checkin, checkout", [
+    # Ranges, in both orders, across months and into next year
+    ("Zamalek, July 12-15, 3 adults", date(2027, 7, 12), date(2027, 7, 15)),
+    ("12 to 15 of November in Maadi", date(2026, 11, 12), date(2026, 11, 15)),
+    ("Oct 30 to Nov 2 please", date(2026, 10, 30), date(2026, 11, 2)),
+    ("Dec 30 - Jan 2 in Maadi", date(2026, 12, 30), date(2027, 1, 2)),
+    ("July 12-15", date(2027, 7, 12), date(2027, 7, 15)),
+    # Single dates roll forward a year once they have passed
+    ("a flat from Jan 5 for 3 nights", date(2027, 1, 5), date(2027, 1, 8)),
+    ("a flat from Oct 20 for 2 nights", date(2026, 10, 20), date(2026, 10, 22)),
+    ("book 2026-11-01 to 2026-11-04", date(2026, 11, 1), date(2026, 11, 4)),
+    ("May 3, 2 adults", date(2027, 5, 3), None),
+    # Relative phrases in a travel context
+    ("I need a flat today", TODAY, None),
+    ("a room tomorrow for 4 nights", date(2026, 10, 19), date(2026, 10, 23)),
+    ("a place next weekend", date(2026, 10, 29), date(2026, 10, 31)),
+    # Arabic, with Arabic-Indic digits
+    ("عايز شقة في الزمالك من 12 إلى 15 يوليو", date(2027, 7, 12), date(2027, 7, 15)),
+    ("شقة من ١٢ إلى ١٥ يوليو", date(2027, 7, 12), date(2027, 7, 15)),
+    ("عايز شقة النهاردة لمدة 3 ليالي", TODAY, date(2026, 10, 21)),
+    # Invalid dates are dropped rather than guessed
+    ("Feb 30 in Zamalek", None, None),
+    ("31/4 in Maadi", None, None),
+    ("book 2026-13-01", None, None),
+    # Area names that look like dates
+    ("I want to stay in 6th of October", None, None),
+    ("apartment in 6 october city for 2 adults", None, None),
+    ("شقة في مدينة أكتوبر من 12 إلى 15 يوليو", date(2027, 7, 12), date(2027, 7, 15)),
+    # Not about a stay
+    ("what's the weather today?", None, None),
+    ("اليوم الجو حلو؟", None, None),
+    ("today", None, None),
+    # "may" followed by a guest count is not a month
+    ("may 3 people", None, None),
+    ("Cairo, may 3 people come?", None, None),
+])
+def test_parse_dates(text, checkin, checkout):
+    assert parse_dates(text, TODAY) == (checkin, checkout)
+
+
+@pytest.mark.parametrize("text, guests", [
+    ("3 adults and a baby", {"adults": 3, "infants": 1}),
+    ("family of 5 people with a dog", {"adults": 5, "pets": 1}),
+    ("2 adults, 2 kids", {"adults": 2, "children": 2}),
+    ("may 3 people", {"adults": 3}),
+    ("my wife and I", {"adults": 2}),
+    ("لـ 3 بالغين وطفلين", {"adults": 3, "children": 2}),
+    ("Is it quiet at night?", {}),
+])
+def test_parse_guests(text, guests):
+    assert parse_guests(text) == guests
+
+
+@pytest.mark.parametrize("text, city, found", [
+    ("what's the weather today?", None, False),
+    ("Cairo next weekend 2 adults", "Cairo", True),
+    ("a place in Sheikh Zayed", "Giza", True),
+    ("Looking for a place in Alexandria for 2 adults next weekend", "Alexandria", True),
+    ("شقة في الغردقة", "Hurghada", True),
+])
+def test_extract_intent_city(text, city, found):
+    intent = extract_intent(text, TODAY)
+    assert (intent.city, intent.found) == (city, found)
+
+
+def test_follow_up_uses_session_context():
+    intent = extract_intent("Can we move it to next month?", TODAY, {"city": "Cairo", "areas": "Zamalek"})
+    assert intent.checkin == date(2026, 11, 1)
+    assert [a.name for a in intent.areas] == ["Zamalek"]
+
+
+def test_city_outside_catalogue_is_not_replaced_by_cairo():
+    intent = extract_intent("Looking for a place in Alexandria for 2 adults", TODAY,
+                            {"city": "Cairo", "areas": "Zamalek"})
+    context = intent.prompt_context(TODAY)
+    assert "city Alexandria" in context
+    assert "city Cairo" not in context
+    assert "chosen only from" not in context
+    assert intent.areas == []
+    assert booking_links("Try **Zamalek** or Downtown", intent, TODAY) == []
+
+
+def test_catalogued_city_gets_area_list_and_links():
+    intent = extract_intent("Zamalek, July 12-15, 3 adults", TODAY)
+    assert "chosen only from" in intent.prompt_context(TODAY)
+    (label, url), = booking_links("**Zamalek** is leafy", intent, TODAY)
+    assert label == "Explore Zamalek"
+    assert "Cairo--Zamalek" in url and "checkin=2027-07-12" in url and "adults=3" in url
+
+
+def test_past_explicit_dates_are_dropped():
+    intent = extract_intent("Cairo, 2025-01-03 to 2025-01-05", TODAY)
+    assert (intent.checkin, intent.checkout) == (None, None)
+    assert "2025" not in intent.summary_line()
+    assert "dates not given" in intent.prompt_context(TODAY)
@@ -0,0 +1,33 @@
+import io
+import json
+import logging
+from logging.handlers import QueueListener
+from queue import SimpleQueue
+
+from logging_config import DeferredQueueHandler, JsonFormatter
+
+
+def test_exception_reaches_formatter_as_its_own_field():
+    out = io.StringIO()
+    stream = logging.StreamHandler(out)
+    stream.setFormatter(JsonFormatter())
+    queue = SimpleQueue()
+    listener = QueueListener(queue, stream)
+    logger = logging.getLogger("tests.logging_config")
+    logger.propagate = False
+    logger.addHandler(DeferredQueueHandler(queue))
+    listener.start()
+    try:
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("failed for %s", "chat", extra={"chat_id": 7})
+    finally:
+        listener.stop()
+        logger.handlers.clear()
+
+    entry = json.loads(out.getvalue())
+    assert entry["msg"] == "failed for chat"
+    assert entry["chat_id"] == 7
+    assert "ValueError: boom" in entry["exc"]
+    assert "Traceback" not in entry["msg"]
@@ -0,0 +1,59 @@
+from datetime import date
+
+import pytest
+
+from booking_intent import extract_intent
+from reply_cache import ReplyCache, intent_key, is_cacheable
+
+TODAY = date(2026, 10, 18)
+
+
+def first_turn(message):
+    return [{"role": "system", "content": "prompt"}, {"role": "user", "content": message}]
+
+
+def lookup(cache, message, lang="en"):
+    """The /chat cache path: a key only for cacheable turns, then a lookup."""
+    intent = extract_intent(message, TODAY)
+    if not is_cacheable(first_turn(message), intent):
+        return None, None
+    key = intent_key(intent, lang)
+    return key, cache.get(key)
+
+
+@pytest.mark.parametrize("message", [
+    "what's the weather today?",
+    "I'd like to visit Egypt, my wife and I",
+    "Looking for a place in Alexandria for 2 adults next weekend",
+    "next weekend for 2 adults",
+])
+def test_not_cacheable(message):
+    intent = extract_intent(message, TODAY)
+    assert not is_cacheable(first_turn(message), intent)
+
+
+def test_follow_up_turn_not_cacheable():
+    intent = extract_intent("Zamalek next weekend", TODAY)
+    history = first_turn("hi") + [{"role": "assistant", "content": "hello"}, {"role": "user", "content": "Zamalek"}]
+    assert not is_cacheable(history, intent)
+
+
+def test_same_intent_shares_a_key_across_guests_and_dates():
+    a = extract_intent("Cairo next weekend 2 adults", TODAY)
+    b = extract_intent("Cairo, Nov 5 to Nov 7, 4 adults and a baby", TODAY)
+    assert intent_key(a, "en") == intent_key(b, "en") == "Cairo|-|en|short"
+
+
+def test_other_city_and_off_topic_replies_never_served_from_cache():
+    cache = ReplyCache(path="")
+    key, text = lookup(cache, "Cairo next weekend 2 adults")
+    assert key and text is None
+    cache.put(key, "**Zamalek** is leafy and central.")
+
+    for message in ("Looking for a place in Alexandria for 2 adults next weekend",
+                    "what's the weather today?",
+                    "I'd like to visit Egypt, my wife and I"):
+        assert lookup(cache, message) == (None, None)
+    # Off-topic turns never reach put(), so they can't be served to a booking request either
+    assert lookup(cache, "Cairo, Oct 29 to Oct 31, 3 adults")[1] == "**Zamalek** is leafy and central."
+    assert len(cache) == 1
@@ -0,0 +1,41 @@
+from datetime import date
+
+from booking_intent import extract_intent
+from session_store import is_summary, session_facts, window_history
+
+TODAY = date(2026, 10, 18)
+SYSTEM = {"role": "system", "content": "prompt"}
+
+
+def turn(history, message):
+    """What start_turn does with a message: parse on top of saved facts, then window."""
+    history = history + [{"role": "user", "content": message}]
+    intent = extract_intent(message, TODAY, session_facts(history))
+    return window_history(history, intent.facts(), token_budget=60), intent
+
+
+def test_follow_up_keeps_facts_parsed_earlier():
+    history, _ = turn([SYSTEM], "Luxor next weekend, two adults with a baby and two kids")
+    history.append({"role": "assistant", "content": "Luxor has the East and West Banks."})
+    _, intent = turn(history, "anything quieter?")
+    assert intent.city == "Luxor"
+    assert (intent.checkin, intent.checkout) == (date(2026, 10, 29), date(2026, 10, 31))
+    assert (intent.adults, intent.children, intent.infants) == (2, 2, 1)
+
+
+def test_window_keeps_one_summary_and_drops_old_turns():
+    history, _ = turn([SYSTEM], "Zamalek, July 12-15, 3 adults")
+    for i in range(10):
+        history.append({"role": "assistant", "content": "x" * 100})
+        history, intent = turn(history, f"question {i}?")
+    assert history[0] == SYSTEM
+    assert sum(is_summary(m) for m in history) == 1
+    assert history[-1]["content"] == "question 9?"
+    assert len(history) < 10
+    assert [a.name for a in intent.areas] == ["Zamalek"] and intent.adults == 3
+
+
+def test_no_summary_without_booking_details():
+    history, intent = turn([SYSTEM], "what's the weather today?")
+    assert not intent.found
+    assert not any(is_summary(m) for m in history)
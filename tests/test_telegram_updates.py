@@ -0,0 +1,62 @@
+import asyncio
+
+from telegram_updates import UpdateProcessor
+
+
+def update(update_id, chat_id, text=None, contact=None):
+    message = {"message_id": update_id, "chat": {"id": chat_id, "type": "private"}}
+    if contact:
+        message["contact"] = {"phone_number": contact}
+    else:
+        message["text"] = text
+    return {"update_id": update_id, "message": message}
+
+
+async def run(processor, updates):
+    await processor.start()
+    statuses = [processor.submit(u) for u in updates]
+    await processor.stop()
+    return statuses
+
+
+def test_each_chat_keeps_its_order_within_a_batch():
+    calls = []
+
+    async def record(messages):
+        calls.append([(m["chat"]["id"], "contact" if "contact" in m else m["text"]) for m in messages])
+
+    processor = UpdateProcessor({"/start": record, "contact": record}, workers=1, batch_wait=0.05)
+    asyncio.run(run(processor, [
+        update(1, "B", "/start"), update(2, "A", contact="+201"), update(3, "A", "/start"), update(4, "C", "/start"),
+    ]))
+    flat = [call for batch in calls for call in batch]
+    assert flat.index(("A", "contact")) < flat.index(("A", "/start"))
+    # B and C still share one handler call
+    assert any(("B", "/start") in batch and ("C", "/start") in batch for batch in calls)
+
+
+def test_failing_message_does_not_take_the_batch_with_it():
+    handled = []
+
+    async def contacts(messages):
+        if any(m["contact"]["phone_number"] == "bad" for m in messages):
+            raise ValueError("bad contact")
+        handled.extend(m["chat"]["id"] for m in messages)
+
+    processor = UpdateProcessor({"contact": contacts}, workers=1, batch_wait=0.05)
+    asyncio.run(run(processor, [update(1, 1, contact="+201"), update(2, 2, contact="bad"), update(3, 3, contact="+203")]))
+    assert handled == [1, 3]
+    assert processor.stats["handled"] == 2 and processor.stats["failed"] == 1
+    # The failed update can be delivered again; the others are still duplicates
+    assert 2 not in processor.seen and 1 in processor.seen and 3 in processor.seen
+
+
+def test_duplicates_and_updates_without_a_chat():
+    async def noop(messages):
+        pass
+
+    processor = UpdateProcessor({"/start": noop}, workers=1)
+    statuses = asyncio.run(run(processor, [
+        update(1, 1, "/start"), update(1, 1, "/start"), {"update_id": 2, "message": "x"}, {"update_id": 3},
+    ]))
+    assert statuses == ["queued", "duplicate", "ignored", "ignored"]